@@ -2,6 +2,7 @@
 # therefore we should use abstract classes to define the core functions and then implement them in the three different ways.
 
 from abc import ABC, abstractmethod
+from core_utils import ErrorCode
 
 class AbstractCore(ABC):
     @abstractmethod
@@ -37,4 +38,38 @@ class AbstractCore(ABC):
         """
         Matches a document against all active queries and stores the result if matched.
         """
-        pass
\ No newline at end of file
+        pass
+
+    def match_documents(self, batch):
+        """
+        Matches a batch of (doc_id, content) documents. The results are stored in the order of the batch.
+        """
+        for doc_id, content in batch:
+            err = self.match_document(doc_id, content)
+            if err != ErrorCode.EC_SUCCESS:
+                return err
+        return ErrorCode.EC_SUCCESS
+
+    def get_available_results(self, max_results=None):
+        """
+        Retrieves all results that are available right now (at most max_results) as (doc_id, num_res, query_ids).
+        """
+        results = []
+        while max_results is None or len(results) < max_results:
+            err, doc_id, num_res, query_ids = self.get_next_avail_res()
+            if err != ErrorCode.EC_SUCCESS:
+                break
+            results.append((doc_id, num_res, query_ids))
+        return results
+
+    def get_stats(self):
+        """
+        Returns the runtime statistics of the core as a dict, see core_stats.py. Cores without statistics return an empty dict.
+        """
+        return {}
+
+    def reset_stats(self):
+        """
+        Resets the runtime statistics of the core.
+        """
+        pass
@@ -0,0 +1,81 @@
+# Compares the deletion index of the max throughput core with the BK-tree core (bk_tree_core.py) on EDIT queries
+# of different term lengths and distances: build time, index memory and latency per document.
+# The deletion index grows with C(term length, distance) postings per term, the BK-tree has one node per term.
+# usage: python3 benchmark_bk_tree.py [number of queries]
+# every core runs in its own process, so that the resident memory of one does not hide the other.
+from multiprocessing import Process, Queue
+import random
+import sys
+import time
+
+from benchmark_utils import get_peak_rss_mb
+from bk_tree_core import BKTreeCore
+from core_utils import MatchType
+from max_throughput_core import MaxThroughputCore
+
+DEFAULT_NUM_QUERIES = 2_000
+NUM_DOCUMENTS = 20
+DOCUMENT_LENGTH = 300
+TERM_LENGTHS = [(4, 6), (8, 10), (12, 15)]
+MATCH_DISTS = [1, 2, 3]
+
+def random_word(rnd, term_length):
+    return "".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(*term_length)))
+
+def add_typo(rnd, word):
+    position = rnd.randrange(len(word))
+    return word[:position] + rnd.choice("abcdefghijklmnopqrstuvwxyz") + word[position + 1:]
+
+def create_core(core_name):
+    # no cache and no workers, every document word is looked up in the main process
+    if core_name == "index":
+        return MaxThroughputCore(num_workers=0, cache_size=0)
+    return BKTreeCore()
+
+def run_core(core_name, queries, documents, result_queue):
+    rss_before = get_peak_rss_mb()
+    core = create_core(core_name)
+    core.initialize_index()
+    start_time = time.perf_counter()
+    for query in queries:
+        core.start_query(*query)
+    build_time = time.perf_counter() - start_time
+    index_rss = get_peak_rss_mb() - rss_before
+
+    start_time = time.perf_counter()
+    for doc_id, content in enumerate(documents):
+        core.match_document(doc_id, content)
+    results = [(doc_id, set(query_ids)) for doc_id, _, query_ids in core.get_available_results()]
+    latency = (time.perf_counter() - start_time) / len(documents)
+    core.destroy_index()
+
+    result_queue.put((build_time, index_rss, latency, results))
+
+def benchmark_bk_tree(num_queries, term_length, match_dist, rnd):
+    vocabulary = [random_word(rnd, term_length) for _ in range(num_queries)]
+    queries = [(query_id, " ".join(rnd.sample(vocabulary, rnd.randint(1, 3))), MatchType.EDIT.value, match_dist)
+               for query_id in range(num_queries)]
+    documents = [" ".join(add_typo(rnd, rnd.choice(vocabulary)) if rnd.random() < 0.3 else random_word(rnd, term_length)
+                          for _ in range(DOCUMENT_LENGTH)) for _ in range(NUM_DOCUMENTS)]
+
+    expected_results = None
+    for core_name in ["index", "bk_tree"]:
+        result_queue = Queue()
+        process = Process(target=run_core, args=(core_name, queries, documents, result_queue))
+        process.start()
+        build_time, index_rss, latency, results = result_queue.get()
+        process.join()
+
+        if expected_results is None:
+            expected_results = results
+        assert results == expected_results, "The cores found different matches."
+
+        print(f"term length {term_length}, distance {match_dist}, {core_name:>7}: build {build_time:.2f}s, "
+              f"index rss={index_rss:.1f}MB, {latency * 1000:.1f}ms per document")
+
+if __name__ == "__main__":
+    num_queries = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NUM_QUERIES
+    rnd = random.Random(42)
+    for term_length in TERM_LENGTHS:
+        for match_dist in MATCH_DISTS:
+            benchmark_bk_tree(num_queries, term_length, match_dist, rnd)
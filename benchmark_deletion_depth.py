@@ -0,0 +1,51 @@
+# Compares the document word lookup with a fixed deletion depth of 3 on a single index
+# against the length partitioned index with adaptive deletion depth.
+# usage: python3 benchmark_deletion_depth.py
+import random
+import time
+
+from core_utils import MatchType
+from index_backends import create_index
+from partitioned_index import LengthPartitionedIndex
+
+NUM_TERMS = 2_000
+NUM_DOC_WORDS = 5_000
+
+# (match_type, match_dist) -> share of the terms
+WORKLOADS = {
+    "exact heavy": {(MatchType.EXACT, 0): 0.9, (MatchType.HAMMING, 1): 0.05, (MatchType.EDIT, 1): 0.05},
+    "distance 1 heavy": {(MatchType.EXACT, 0): 0.1, (MatchType.HAMMING, 1): 0.45, (MatchType.EDIT, 1): 0.45},
+    "mixed": {(MatchType.EXACT, 0): 0.25, (MatchType.HAMMING, 2): 0.25, (MatchType.EDIT, 1): 0.25, (MatchType.EDIT, 3): 0.25},
+}
+
+def random_word(rnd):
+    return "".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(3, 12)))
+
+def time_lookups(index, doc_words):
+    start_time = time.perf_counter()
+    matches = [index.find_word_matches(word) for word in doc_words]
+    return time.perf_counter() - start_time, matches
+
+def benchmark_workload(name, term_types, rnd):
+    vocabulary = [random_word(rnd) for _ in range(NUM_TERMS * 2)]
+    term_type_list, weights = list(term_types), list(term_types.values())
+
+    fixed_depth_index = create_index("hash")
+    adaptive_index = LengthPartitionedIndex("hash")
+    for term_id, term in enumerate(rnd.sample(vocabulary, NUM_TERMS)):
+        match_type, match_dist = rnd.choices(term_type_list, weights)[0]
+        fixed_depth_index.insert_query(term_id, match_type, match_dist, [term])
+        adaptive_index.insert_query(term_id, match_type, match_dist, [term])
+
+    doc_words = [rnd.choice(vocabulary) for _ in range(NUM_DOC_WORDS)]
+    fixed_time, fixed_matches = time_lookups(fixed_depth_index, doc_words)
+    adaptive_time, adaptive_matches = time_lookups(adaptive_index, doc_words)
+    assert fixed_matches == adaptive_matches, "The indexes found different matches."
+
+    print(f"{name:>16}: fixed depth {NUM_DOC_WORDS / fixed_time:,.0f} words/s, "
+          f"adaptive {NUM_DOC_WORDS / adaptive_time:,.0f} words/s ({fixed_time / adaptive_time:.1f}x)")
+
+if __name__ == "__main__":
+    rnd = random.Random(42)
+    for name, term_types in WORKLOADS.items():
+        benchmark_workload(name, term_types, rnd)
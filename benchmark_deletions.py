@@ -0,0 +1,59 @@
+# Micro benchmark of the deletion generation: the previous generator (mask combinations and a character loop per
+# variant) against the precomputed deletion tables of deletion_utils.py, per word and in numpy batches.
+# usage: python3 benchmark_deletions.py [test file]
+import itertools
+import time
+
+from benchmark_utils import get_benchmark_file, load_test_file
+from deletion_utils import get_batch_deletions, get_word_deletions, MIN_NUMPY_BATCH
+
+MAX_DIST = 3
+
+def generate_combinations(array_length, max_ones):
+    # the previous generator, without its cache the masks are rebuilt per word
+    result = {0}
+    for num_ones in range(1, max_ones + 1):
+        for indices in itertools.combinations(range(array_length), num_ones):
+            mask = 0
+            for index in indices:
+                mask |= 1 << index
+            result.add(mask)
+    return result
+
+def generate_with_mask_loop(words, max_dist):
+    combinations = {}
+    deletions = set()
+    for word in words:
+        masks = combinations.get(len(word), None)
+        if masks is None:
+            masks = combinations[len(word)] = generate_combinations(len(word), max_dist)
+        for mask in masks:
+            deletions.add(("".join([letter for index, letter in enumerate(word) if not mask >> index & 1]), mask, word))
+    return deletions
+
+def generate_per_word(words, max_dist):
+    return [(variant, mask, word) for word in words for variant, mask in get_word_deletions(word, max_dist)]
+
+def generate_batched(words, max_dist):
+    length_words = {}
+    for word in words:
+        length_words.setdefault(len(word), []).append(word)
+    return [deletion for same_length_words in length_words.values() for deletion in get_batch_deletions(same_length_words, max_dist)]
+
+if __name__ == "__main__":
+    test_fp = get_benchmark_file()
+    _, documents = load_test_file(test_fp)
+    words = list({word for _, doc_words in documents for word in doc_words})
+    print(f"Generating the deletions (max distance {MAX_DIST}) of {len(words)} distinct document words from {test_fp}, "
+          f"numpy batches from {MIN_NUMPY_BATCH} words of a length")
+
+    results = {}
+    generators = [("mask loop", generate_with_mask_loop), ("table join", generate_per_word), ("numpy batch", generate_batched)]
+    for name, generate in generators:
+        start_time = time.perf_counter()
+        deletions = generate(words, MAX_DIST)
+        total_time = time.perf_counter() - start_time
+        results[name] = set(deletions)
+        print(f"{name:>12}: {total_time:.4f}s, {len(deletions) / total_time:,.0f} variants/s")
+
+    assert results["mask loop"] == results["table join"] == results["numpy batch"], "The generators found different deletions."
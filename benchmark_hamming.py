@@ -0,0 +1,63 @@
+# Compares the HAMMING matching of the deletion index with the numpy hamming verifier (hamming_verifier.py) on
+# hamming heavy workloads: all queries are HAMMING queries, the documents contain typos of the query terms.
+# usage: python3 benchmark_hamming.py [number of queries]
+import random
+import sys
+import time
+
+from core_utils import MatchType
+from max_throughput_core import MaxThroughputCore
+
+DEFAULT_NUM_QUERIES = 20_000
+NUM_DOCUMENTS = 50
+DOCUMENT_LENGTH = 300
+
+def random_word(rnd, term_length):
+    return "".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(*term_length)))
+
+def add_typos(rnd, word):
+    word = list(word)
+    for _ in range(rnd.randint(0, 3)):
+        word[rnd.randrange(len(word))] = rnd.choice("abcdefghijklmnopqrstuvwxyz")
+    return "".join(word)
+
+def run_core(core, queries, documents):
+    core.initialize_index()
+    start_time = time.perf_counter()
+    for query in queries:
+        core.start_query(*query)
+    build_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for doc_id, document in enumerate(documents):
+        core.match_document(doc_id, document)
+    results = core.get_available_results()
+    match_time = time.perf_counter() - start_time
+    core.destroy_index()
+    return build_time, match_time, results
+
+def benchmark_hamming(num_queries, term_length, rnd):
+    vocabulary = [random_word(rnd, term_length) for _ in range(num_queries)]
+    queries = [(query_id, " ".join(rnd.sample(vocabulary, rnd.randint(1, 3))), MatchType.HAMMING.value, rnd.randint(1, 3))
+               for query_id in range(num_queries)]
+    documents = [" ".join(add_typos(rnd, rnd.choice(vocabulary)) if rnd.random() < 0.5 else random_word(rnd, term_length)
+                          for _ in range(DOCUMENT_LENGTH)) for _ in range(NUM_DOCUMENTS)]
+
+    print(f"{num_queries} hamming queries, term length {term_length}, {NUM_DOCUMENTS} documents of {DOCUMENT_LENGTH} words")
+    expected_results = None
+    for hamming_verifier in ["index", "numpy"]:
+        # no cache, every document word is verified
+        core = MaxThroughputCore(num_workers=0, cache_size=0, hamming_verifier=hamming_verifier)
+        build_time, match_time, results = run_core(core, queries, documents)
+        if expected_results is None:
+            expected_results = results
+        assert results == expected_results, "The verifiers found different matches."
+
+        print(f"{hamming_verifier:>6}: build {build_time:.2f}s, match {match_time:.2f}s ({NUM_DOCUMENTS / match_time:.1f} documents/s)")
+
+if __name__ == "__main__":
+    num_queries = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NUM_QUERIES
+    rnd = random.Random(42)
+    # short terms are compared packed into an uint64, long ones as matrices
+    for term_length in [(4, 8), (9, 15)]:
+        benchmark_hamming(num_queries, term_length, rnd)
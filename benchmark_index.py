@@ -0,0 +1,45 @@
+# Compares the index backends: build time, lookup throughput and resident memory.
+# usage: python3 benchmark_index.py [test file]
+# every backend runs in its own process, so that the resident memory of one does not hide the other.
+from multiprocessing import Process
+import time
+
+from benchmark_utils import get_benchmark_file, load_test_file, get_peak_rss_mb
+from index_backends import INDEX_BACKENDS, create_index
+from trie_utils import input_query_in_trie, get_deletions_for_document
+
+def benchmark_backend(backend, test_fp):
+    queries, documents = load_test_file(test_fp)
+
+    # the lookups are the same for every backend: all deletions of all document words
+    doc_variants = [variant for _, doc_words in documents for variant, _, _ in get_deletions_for_document(set(doc_words), max_dist=3)]
+    rss_before = get_peak_rss_mb()
+
+    index = create_index(backend)
+    start_time = time.perf_counter()
+    for query_id, match_type, match_dist, terms in queries:
+        input_query_in_trie(index, query_id, match_type, match_dist, terms)
+    build_time = time.perf_counter() - start_time
+
+    rss_after = get_peak_rss_mb()
+
+    start_time = time.perf_counter()
+    found = 0
+    for variant in doc_variants:
+        if index.get(variant, None):
+            found += 1
+    lookup_time = time.perf_counter() - start_time
+
+    index_stats = index.stats()
+    print(f"{backend:>6}: keys={index_stats['keys']}, postings={index_stats['postings']}, build={build_time:.3f}s, "
+          f"lookups={len(doc_variants) / lookup_time:,.0f}/s ({found} hits), "
+          f"index rss={rss_after - rss_before:.1f}MB, {index_stats['bytes_per_posting']:.1f} bytes per posting")
+
+if __name__ == "__main__":
+    test_fp = get_benchmark_file()
+    print(f"Benchmarking index backends on {test_fp}")
+
+    for backend in INDEX_BACKENDS:
+        process = Process(target=benchmark_backend, args=(backend, test_fp))
+        process.start()
+        process.join()
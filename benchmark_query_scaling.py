@@ -0,0 +1,49 @@
+# Sweeps the number of active queries and measures the time per document.
+# usage: python3 benchmark_query_scaling.py
+# The documents are short and stay the same, so the time per document should only grow with the number of hits
+# and not with the number of active queries.
+import random
+import time
+
+from core_utils import MatchType
+from max_throughput_core import MaxThroughputCore
+
+QUERY_COUNTS = [1_000, 10_000, 100_000]
+NUM_DOCUMENTS = 1_000
+WORDS_PER_DOCUMENT = 10
+
+def random_word(rnd):
+    return "".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(4, 10)))
+
+def benchmark_query_count(num_queries, rnd):
+    vocabulary = [random_word(rnd) for _ in range(max(num_queries, 10_000))]
+    # without the cache every document is matched from scratch
+    core = MaxThroughputCore(num_workers=0, cache_size=0)
+    core.initialize_index()
+
+    start_time = time.perf_counter()
+    for query_id in range(num_queries):
+        terms = " ".join(rnd.sample(vocabulary, rnd.randint(1, 3)))
+        # mostly exact queries, so that building the index stays fast
+        if rnd.random() < 0.9:
+            core.start_query(query_id, terms, MatchType.EXACT.value, 0)
+        else:
+            core.start_query(query_id, terms, MatchType.HAMMING.value, 1)
+    build_time = time.perf_counter() - start_time
+
+    documents = [(doc_id, " ".join(rnd.choice(vocabulary) for _ in range(WORDS_PER_DOCUMENT))) for doc_id in range(NUM_DOCUMENTS)]
+
+    start_time = time.perf_counter()
+    for doc_id, content in documents:
+        core.match_document(doc_id, content)
+    match_time = time.perf_counter() - start_time
+
+    num_matches = sum(num_res for _, num_res, _ in core.get_available_results())
+    core.destroy_index()
+
+    print(f"{num_queries:>8} queries: build={build_time:.2f}s, {match_time / NUM_DOCUMENTS * 1e6:,.0f}us per document, {num_matches} matches")
+
+if __name__ == "__main__":
+    rnd = random.Random(42)
+    for num_queries in QUERY_COUNTS:
+        benchmark_query_count(num_queries, rnd)
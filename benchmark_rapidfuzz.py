@@ -0,0 +1,62 @@
+# Compares the deletion index of the max throughput core with the brute force rapidfuzz core (rapidfuzz_core.py)
+# for a growing number of queries. The rapidfuzz core compares every document word with every term, its cost grows
+# with the number of terms. The index only probes the deletions of the word, but every probe is python code.
+# usage: python3 benchmark_rapidfuzz.py [number of documents]
+import random
+import sys
+import time
+
+from core_utils import MatchType
+from max_throughput_core import MaxThroughputCore
+from rapidfuzz_core import RapidFuzzCore
+
+QUERY_COUNTS = [100, 1_000, 10_000]
+DEFAULT_NUM_DOCUMENTS = 100
+DOCUMENT_LENGTH = 300
+
+def random_word(rnd):
+    return "".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(4, 12)))
+
+def add_typo(rnd, word):
+    position = rnd.randrange(len(word))
+    return word[:position] + rnd.choice("abcdefghijklmnopqrstuvwxyz") + word[position + 1:]
+
+def run_core(core, queries, documents):
+    core.initialize_index()
+    start_time = time.perf_counter()
+    for query in queries:
+        core.start_query(*query)
+    build_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for doc_id, content in enumerate(documents):
+        core.match_document(doc_id, content)
+    results = [(doc_id, set(query_ids)) for doc_id, _, query_ids in core.get_available_results()]
+    match_time = time.perf_counter() - start_time
+    core.destroy_index()
+    return build_time, match_time, results
+
+def benchmark_query_count(num_queries, num_documents, rnd):
+    vocabulary = [random_word(rnd) for _ in range(max(num_queries, 1_000))]
+    queries = []
+    for query_id in range(num_queries):
+        match_type = rnd.choice(list(MatchType)).value
+        match_dist = 0 if match_type == MatchType.EXACT.value else rnd.randint(1, 3)
+        queries.append((query_id, " ".join(rnd.sample(vocabulary, rnd.randint(1, 3))), match_type, match_dist))
+    documents = [" ".join(add_typo(rnd, word) if rnd.random() < 0.1 else word for word in rnd.sample(vocabulary, DOCUMENT_LENGTH))
+                 for _ in range(num_documents)]
+
+    expected_results = None
+    for core_name, core in [("index", MaxThroughputCore(num_workers=0, cache_size=0)), ("rapidfuzz", RapidFuzzCore())]:
+        build_time, match_time, results = run_core(core, queries, documents)
+        if expected_results is None:
+            expected_results = results
+        assert results == expected_results, "The cores found different matches."
+
+        print(f"{num_queries:>6} queries {core_name:>9}: build {build_time:.2f}s, {num_documents / match_time:.1f} documents/s")
+
+if __name__ == "__main__":
+    num_documents = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NUM_DOCUMENTS
+    rnd = random.Random(42)
+    for num_queries in QUERY_COUNTS:
+        benchmark_query_count(num_queries, num_documents, rnd)
@@ -0,0 +1,65 @@
+# Compares the deletion index with the signature index (signature_index.py) for growing term lengths:
+# build time, index memory and document word lookups of a LengthPartitionedIndex with different signature thresholds.
+# usage: python3 benchmark_signature.py [number of terms]
+import random
+import sys
+import time
+import tracemalloc
+
+from core_utils import MatchType
+from partitioned_index import LengthPartitionedIndex
+
+DEFAULT_NUM_TERMS = 2_000
+NUM_DOC_WORDS = 2_000
+TERM_LENGTHS = [(6, 9), (10, 13), (14, 17), (18, 22)]
+# None keeps all terms in the deletion index
+SIGNATURE_THRESHOLDS = [None, 10, 14]
+TERM_TYPES = [(MatchType.EXACT, 0), (MatchType.HAMMING, 1), (MatchType.HAMMING, 3), (MatchType.EDIT, 1), (MatchType.EDIT, 2), (MatchType.EDIT, 3)]
+
+def random_word(rnd, term_length):
+    return "".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(*term_length)))
+
+def add_typo(rnd, word):
+    position = rnd.randrange(len(word))
+    return word[:position] + rnd.choice("abcdefghijklmnopqrstuvwxyz") + word[position + 1:]
+
+def build_index(terms, signature_threshold):
+    index = LengthPartitionedIndex("hash", signature_threshold=signature_threshold)
+    for term_id, (term, match_type, match_dist) in enumerate(terms):
+        index.insert_query(term_id, match_type, match_dist, [term])
+    return index
+
+def benchmark_term_length(num_terms, term_length, rnd):
+    terms = [(random_word(rnd, term_length), *rnd.choice(TERM_TYPES)) for _ in range(num_terms)]
+    doc_words = [add_typo(rnd, rnd.choice(terms)[0]) if rnd.random() < 0.5 else random_word(rnd, term_length) for _ in range(NUM_DOC_WORDS)]
+
+    expected_matches = None
+    for signature_threshold in SIGNATURE_THRESHOLDS:
+        start_time = time.perf_counter()
+        index = build_index(terms, signature_threshold)
+        build_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        matches = [index.find_word_matches(word) for word in doc_words]
+        lookup_time = time.perf_counter() - start_time
+        if expected_matches is None:
+            expected_matches = matches
+        assert matches == expected_matches, "The indexes found different matches."
+
+        # the memory is traced in a second build, tracing slows the build down
+        del index
+        tracemalloc.start()
+        index = build_index(terms, signature_threshold)
+        index_memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        stats = index.stats()
+        print(f"term length {term_length}, signature threshold {signature_threshold}: build {build_time:.2f}s, "
+              f"memory {index_memory / 2**20:.1f}MB, postings={stats['postings']}, signature terms={stats['signature_index']['terms']}, "
+              f"{NUM_DOC_WORDS / lookup_time:,.0f} words/s")
+
+if __name__ == "__main__":
+    num_terms = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NUM_TERMS
+    rnd = random.Random(42)
+    for term_length in TERM_LENGTHS:
+        benchmark_term_length(num_terms, term_length, rnd)
@@ -0,0 +1,66 @@
+# Compares the cold rebuild of the index (replaying every start_query) with loading a snapshot.
+# usage: python3 benchmark_snapshot.py [number of queries]
+import os
+import random
+import sys
+import tempfile
+import time
+
+from core_utils import MatchType
+from max_throughput_core import MaxThroughputCore
+
+DEFAULT_NUM_QUERIES = 100_000
+
+def random_word(rnd):
+    return "".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(4, 12)))
+
+def benchmark_snapshot(num_queries, rnd):
+    vocabulary = [random_word(rnd) for _ in range(num_queries)]
+    queries = []
+    for query_id in range(num_queries):
+        match_type = rnd.choice(list(MatchType)).value
+        match_dist = 0 if match_type == MatchType.EXACT.value else rnd.randint(1, 3)
+        queries.append((query_id, " ".join(rnd.sample(vocabulary, rnd.randint(1, 3))), match_type, match_dist))
+    document = " ".join(rnd.sample(vocabulary, 30))
+
+    core = MaxThroughputCore(num_workers=0)
+    core.initialize_index()
+    start_time = time.perf_counter()
+    for query in queries:
+        core.start_query(*query)
+    rebuild_time = time.perf_counter() - start_time
+
+    snapshot_fp = os.path.join(tempfile.mkdtemp(), "index.snapshot")
+    start_time = time.perf_counter()
+    core.save_snapshot(snapshot_fp)
+    save_time = time.perf_counter() - start_time
+    core.match_document(0, document)
+    expected_result = core.get_next_avail_res()
+    core.destroy_index()
+
+    core = MaxThroughputCore(num_workers=0)
+    core.initialize_index()
+    start_time = time.perf_counter()
+    core.load_snapshot(snapshot_fp)
+    load_time = time.perf_counter() - start_time
+
+    # the first document decodes the partitions it probes
+    start_time = time.perf_counter()
+    core.match_document(0, document)
+    first_document_time = time.perf_counter() - start_time
+    assert core.get_next_avail_res() == expected_result
+
+    start_time = time.perf_counter()
+    core.trie.stats()
+    decode_time = time.perf_counter() - start_time
+    core.destroy_index()
+
+    print(f"{num_queries} queries, snapshot size {os.path.getsize(snapshot_fp) / 2**20:.1f}MB")
+    print(f"cold rebuild: {rebuild_time:.2f}s")
+    print(f"save: {save_time:.2f}s")
+    print(f"load: {load_time:.3f}s, first document: {first_document_time:.3f}s, remaining partitions: {decode_time:.3f}s")
+    print(f"speedup (load + first document): {rebuild_time / (load_time + first_document_time):.1f}x")
+    os.remove(snapshot_fp)
+
+if __name__ == "__main__":
+    benchmark_snapshot(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NUM_QUERIES, random.Random(42))
@@ -0,0 +1,238 @@
+# End to end benchmark of the cores on generated workloads (see workload_generator.py).
+# usage: python3 benchmark_suite.py [output prefix] [cores]
+# cores is a comma separated list of "reference", "max_throughput", "dask", "sharded", "rapidfuzz" and "bk_tree" (default: all of them).
+# Starting from a base workload one parameter is swept at a time. Every core replays every workload in its own
+# process. Its peak resident memory is sampled over the whole process tree, so that the worker, shard and dask
+# processes of a core are included. The results are checked against the expected results of the file and
+# written to <output prefix>.csv and <output prefix>.json. Runs that fail or time out are reported and kept in the output.
+import csv
+import json
+from multiprocessing import Process, Queue
+import os
+import queue
+import sys
+import tempfile
+import time
+
+from benchmark_utils import get_peak_rss_mb, get_process_tree_rss_mb
+from core_utils import ErrorCode
+from workload_generator import generate_workload
+
+DEFAULT_OUTPUT_PREFIX = "./benchmark_results"
+# seconds a core gets for one workload
+RUN_TIMEOUT = 1800
+# seconds between two memory samples of the process tree of a core
+RSS_SAMPLE_INTERVAL = 0.05
+
+# the expected results are computed by the reference core, which is slow for large workloads
+BASE_WORKLOAD = {
+    'num_queries': 200,
+    'num_documents': 50,
+    'words_per_query': (1, 5),
+    'document_length': (50, 150),
+    'term_length': (4, 12),
+    'type_weights': (1, 1, 1),
+    'dist_weights': (1, 1, 1),
+}
+
+SWEEPS = {
+    'num_queries': [50, 200, 1000],
+    # only exact, only distance 1, only distance 3
+    'dist_weights': [(1, 0, 0), (0, 0, 1)],
+    'type_weights': [(1, 0, 0), (0, 1, 0), (0, 0, 1)],
+    'term_length': [(3, 6), (10, 15)],
+    'document_length': [(10, 30), (300, 600)],
+}
+
+def create_core(core_name):
+    match core_name:
+        case "reference":
+            from reference_core import ReferenceCore
+            return ReferenceCore()
+        case "max_throughput":
+            from max_throughput_core import MaxThroughputCore
+            return MaxThroughputCore()
+        case "dask":
+            from dask_core import DaskCore
+            return DaskCore()
+        case "sharded":
+            from sharded_core import ShardedCore
+            return ShardedCore()
+        case "rapidfuzz":
+            from rapidfuzz_core import RapidFuzzCore
+            return RapidFuzzCore()
+        case "bk_tree":
+            from bk_tree_core import BKTreeCore
+            return BKTreeCore()
+        case _:
+            raise Exception(f"Unknown core '{core_name}'.")
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(fraction * len(sorted_values)), len(sorted_values) - 1)]
+
+def replay_workload(test_fp, core):
+    """
+    Replays a test file document by document and returns the time spent on the queries and the latency of every document
+    (match_document until its result is available).
+    """
+    query_time = 0.0
+    latencies = []
+    core.initialize_index()
+
+    with open(test_fp, "r") as test_file:
+        for line in test_file:
+            line_tokens = line.split()
+            if not line_tokens:
+                continue
+
+            ch = line_tokens[0]
+            id = int(line_tokens[1])
+            match ch:
+                case 's':
+                    start_time = time.perf_counter()
+                    err = core.start_query(id, " ".join(line_tokens[5:]), int(line_tokens[2]), int(line_tokens[3]))
+                    query_time += time.perf_counter() - start_time
+                    assert err == ErrorCode.EC_SUCCESS, f"Error in StartQuery: {err}"
+                case 'e':
+                    start_time = time.perf_counter()
+                    err = core.end_query(id)
+                    query_time += time.perf_counter() - start_time
+                    assert err == ErrorCode.EC_SUCCESS, f"Error in EndQuery: {err}"
+                case 'm':
+                    content = " ".join(line_tokens[3:])
+                    start_time = time.perf_counter()
+                    err = core.match_document(id, content)
+                    result = core.get_next_avail_res()
+                    latencies.append(time.perf_counter() - start_time)
+                    assert err == ErrorCode.EC_SUCCESS, f"Error in MatchDocument: {err}"
+                case 'r':
+                    err, doc_id, num_res, query_ids = result
+                    assert err == ErrorCode.EC_SUCCESS and doc_id == id, f"Error in GetNextAvailRes: {err}"
+                    assert set(query_ids) == {int(query_id) for query_id in line_tokens[3:]}, f"Wrong result for document {id}"
+                case _:
+                    raise Exception(f"Corrupted Test File. Unknown Command '{ch}'.")
+
+    core.destroy_index()
+    return query_time, latencies
+
+def benchmark_core(core_name, test_fp, result_queue):
+    try:
+        core = create_core(core_name)
+        query_time, latencies = replay_workload(test_fp, core)
+    except Exception as e:
+        # wrong results fail the assertions of replay_workload
+        result_queue.put({'core': core_name, 'error': f"{type(e).__name__}: {e}"})
+        raise
+
+    match_time = sum(latencies)
+    latencies.sort()
+    result_queue.put({
+        'core': core_name,
+        'query_time_s': query_time,
+        'documents_per_s': len(latencies) / match_time if match_time else 0.0,
+        'latency_p50_ms': percentile(latencies, 0.5) * 1000,
+        'latency_p90_ms': percentile(latencies, 0.9) * 1000,
+        'latency_p99_ms': percentile(latencies, 0.99) * 1000,
+        'latency_max_ms': latencies[-1] * 1000 if latencies else 0.0,
+        # the process of the core alone
+        'main_peak_rss_mb': get_peak_rss_mb(),
+    })
+
+def run_core(core_name, test_fp):
+    """
+    Runs benchmark_core in its own process and samples the resident memory of its process tree until the result arrives.
+    Returns the result, with an 'error' if the process failed, exited without a result or timed out.
+    """
+    result_queue = Queue()
+    process = Process(target=benchmark_core, args=(core_name, test_fp, result_queue))
+    process.start()
+    start_time = time.perf_counter()
+    peak_rss_mb, max_process_rss_mb, peak_processes = 0.0, 0.0, 0
+    result = None
+
+    while result is None:
+        process_rss_mb = get_process_tree_rss_mb(process.pid)
+        peak_rss_mb = max(peak_rss_mb, sum(process_rss_mb))
+        # the largest process, e.g. the shards of the sharded core should each stay below the unsharded index
+        max_process_rss_mb = max(max_process_rss_mb, *process_rss_mb, 0.0)
+        peak_processes = max(peak_processes, len(process_rss_mb))
+        try:
+            result = result_queue.get(timeout=RSS_SAMPLE_INTERVAL)
+        except queue.Empty:
+            if process.exitcode is not None:
+                # the result can arrive right before the exit
+                try:
+                    result = result_queue.get(timeout=1)
+                except queue.Empty:
+                    result = {'core': core_name, 'error': f"exited with code {process.exitcode} without a result"}
+            elif time.perf_counter() - start_time > RUN_TIMEOUT:
+                result = {'core': core_name, 'error': f"timed out after {RUN_TIMEOUT}s"}
+
+    process.join(timeout=30)
+    if process.is_alive():
+        process.terminate()
+        process.join()
+
+    if 'error' not in result:
+        result['peak_rss_mb'] = max(peak_rss_mb, result['main_peak_rss_mb'])
+        result['max_process_rss_mb'] = max(max_process_rss_mb, result['main_peak_rss_mb'])
+        result['peak_processes'] = peak_processes
+    return result
+
+def get_workloads():
+    # (swept parameter, workload parameters), the base workload comes first
+    yield "base", dict(BASE_WORKLOAD)
+    for parameter, values in SWEEPS.items():
+        for value in values:
+            if value != BASE_WORKLOAD[parameter]:
+                yield parameter, {**BASE_WORKLOAD, parameter: value}
+
+def run_benchmark_suite(output_prefix, core_names):
+    """
+    Runs all workloads on all cores, writes the results and returns the failed runs.
+    """
+    rows = []
+    failed_runs = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for workload_id, (parameter, workload) in enumerate(get_workloads()):
+            test_fp = os.path.join(temp_dir, f"workload_{workload_id}.txt")
+            generate_workload(test_fp, **workload)
+
+            for core_name in core_names:
+                result = run_core(core_name, test_fp)
+
+                row = {'workload': workload_id, 'swept_parameter': parameter,
+                       **{key: str(value) for key, value in workload.items()}, **result}
+                rows.append(row)
+                label = parameter if parameter == "base" else f"{parameter}={workload[parameter]}"
+                if 'error' in result:
+                    failed_runs.append(f"workload {workload_id} ({label}) {core_name}: {result['error']}")
+                    print(f"workload {workload_id} ({label}) {core_name:>14}: FAILED, {result['error']}")
+                    continue
+                print(f"workload {workload_id} ({label}) {core_name:>14}: "
+                      f"{result['documents_per_s']:,.1f} documents/s, p50={result['latency_p50_ms']:.2f}ms, "
+                      f"p99={result['latency_p99_ms']:.2f}ms, peak rss={result['peak_rss_mb']:.0f}MB "
+                      f"({result['peak_processes']} processes, largest {result['max_process_rss_mb']:.0f}MB)")
+
+    with open(output_prefix + ".csv", "w", newline="") as csv_file:
+        # the rows of failed runs only have an error
+        fieldnames = list(dict.fromkeys(key for row in rows for key in row))
+        writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    with open(output_prefix + ".json", "w") as json_file:
+        json.dump(rows, json_file, indent=2)
+
+    return failed_runs
+
+if __name__ == "__main__":
+    output_prefix = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_OUTPUT_PREFIX
+    core_names = sys.argv[2].split(",") if len(sys.argv) > 2 else ["reference", "max_throughput", "dask", "sharded", "rapidfuzz", "bk_tree"]
+    failed_runs = run_benchmark_suite(output_prefix, core_names)
+    if failed_runs:
+        print(f"{len(failed_runs)} failed runs:")
+        for failed_run in failed_runs:
+            print(failed_run)
+        sys.exit(1)
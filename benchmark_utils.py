@@ -0,0 +1,56 @@
+# Helpers that are shared by the benchmark scripts.
+import resource
+import sys
+
+import psutil
+
+DEFAULT_BENCHMARK_FILE = "./data/small_test.txt"
+
+def get_benchmark_file():
+    # the test file can be passed as first argument
+    return sys.argv[1] if len(sys.argv) > 1 else DEFAULT_BENCHMARK_FILE
+
+def load_test_file(test_fp):
+    """
+    Returns the queries (query_id, match_type, match_dist, terms) and the documents (doc_id, doc_words) of a test file.
+    """
+    queries = []
+    documents = []
+
+    with open(test_fp, "r") as test_file:
+        for line in test_file:
+            line_tokens = line.split()
+            if not line_tokens:
+                continue
+
+            match line_tokens[0]:
+                case 's':
+                    queries.append((int(line_tokens[1]), int(line_tokens[2]), int(line_tokens[3]), line_tokens[5:]))
+                case 'm':
+                    documents.append((int(line_tokens[1]), line_tokens[3:]))
+
+    return queries, documents
+
+def get_peak_rss_mb():
+    # ru_maxrss is in kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def get_process_tree_rss_mb(pid):
+    """
+    Returns the resident memory of a process and of each of its descendants (e.g. the workers or shards of a core).
+    Pages that are shared after a fork are counted in every process.
+    """
+    try:
+        root = psutil.Process(pid)
+        processes = [root, *root.children(recursive=True)]
+    except psutil.NoSuchProcess:
+        return []
+
+    process_rss_mb = []
+    for process in processes:
+        try:
+            process_rss_mb.append(process.memory_info().rss / 2**20)
+        except psutil.NoSuchProcess:
+            # exited in between
+            pass
+    return process_rss_mb
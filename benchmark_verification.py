@@ -0,0 +1,81 @@
+# Micro benchmark of the EDIT verification: bitmask alignment against the bounded levenshtein distance of rapidfuzz.
+# usage: python3 benchmark_verification.py [test file]
+# The candidates are all (document word, query word) pairs that share a deletion variant in the index.
+import time
+
+from benchmark_utils import get_benchmark_file, load_test_file
+from core_utils import MatchType
+from index_backends import create_index
+from trie_utils import input_query_in_trie, get_deletions_for_document
+from verification_utils import is_within_edit_distance
+
+# the previous verification of the index: the deletion masks of both words are aligned
+def _insert_zero_bit(mask, index):
+    # shifts all bits from index on one position up
+    low_bits = mask & ((1 << index) - 1)
+    return low_bits | ((mask >> index) << (index + 1))
+
+def calculate_levenshtein_distance_with_bitmask(mask_1, length_1, mask_2, length_2):
+    start_index = 0
+
+    while start_index < min(length_1, length_2):
+        bit1 = mask_1 >> start_index & 1
+        bit2 = mask_2 >> start_index & 1
+
+        if bit2 and not bit1:
+            mask_1 = _insert_zero_bit(mask_1, start_index)
+            length_1 += 1
+        elif bit1 and not bit2:
+            mask_2 = _insert_zero_bit(mask_2, start_index)
+            length_2 += 1
+
+        start_index += 1
+
+    # only the trailing ones are left, they are already aligned.
+    return (mask_1 | mask_2).bit_count()
+
+def collect_edit_candidates(test_fp):
+    queries, documents = load_test_file(test_fp)
+
+    index = create_index("hash")
+    for query_id, match_type, match_dist, terms in queries:
+        if MatchType(match_type) == MatchType.EDIT:
+            input_query_in_trie(index, query_id, match_type, match_dist, terms)
+
+    doc_words = {word for _, words in documents for word in words}
+    candidates = []
+    for variant, doc_mask, doc_word in get_deletions_for_document(doc_words, max_dist=3):
+        for row in index.get(variant, ()):
+            query_id, _, query_dist, query_mask, query_word = index.postings.get(row)
+            candidates.append((query_id, query_dist, query_mask, query_word, doc_mask, doc_word))
+
+    return candidates
+
+def verify_with_bitmask(candidates):
+    matches = set()
+    for query_id, query_dist, query_mask, query_word, doc_mask, doc_word in candidates:
+        if calculate_levenshtein_distance_with_bitmask(doc_mask, len(doc_word), query_mask, len(query_word)) <= query_dist:
+            matches.add((query_id, query_word, doc_word))
+    return matches
+
+def verify_rapidfuzz(candidates):
+    matches = set()
+    for query_id, query_dist, query_mask, query_word, doc_mask, doc_word in candidates:
+        if is_within_edit_distance(query_word, doc_word, query_dist):
+            matches.add((query_id, query_word, doc_word))
+    return matches
+
+if __name__ == "__main__":
+    test_fp = get_benchmark_file()
+    candidates = collect_edit_candidates(test_fp)
+    print(f"Verifying {len(candidates)} EDIT candidates from {test_fp}")
+
+    results = {}
+    verifiers = [("bitmask", verify_with_bitmask), ("rapidfuzz", verify_rapidfuzz)]
+    for name, verify in verifiers:
+        start_time = time.perf_counter()
+        results[name] = verify(candidates)
+        total_time = time.perf_counter() - start_time
+        print(f"{name:>12}: {total_time:.4f}s, {len(candidates) / total_time:,.0f} candidates/s, {len(results[name])} matches")
+
+    assert results["bitmask"] == results["rapidfuzz"], "The verifiers found different matches."
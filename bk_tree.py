@@ -0,0 +1,97 @@
+# BK-tree: metric tree over the words of a distance (levenshtein or hamming).
+# Every child of a node is stored under its distance to the node. By the triangle inequality a word within radius r
+# of the searched word can only be below the children with distance d - r .. d + r, where d is the distance of the
+# searched word to the node. Unlike the deletion index the size of the tree does not depend on the term length or
+# the distance, one node per term.
+# Removed terms stay in the tree as routing nodes, the tree is rebuilt once most of its nodes are removed.
+
+# a node is a list: [word, term_id or None if removed, {distance: child node}]
+WORD, TERM_ID, CHILDREN = 0, 1, 2
+
+class BKTree:
+    def __init__(self, distance):
+        # distance(word_1, word_2) -> int, must be a metric
+        self.distance = distance
+        self.root = None
+        self.num_nodes = 0
+        self.num_terms = 0
+
+    def __len__(self):
+        return self.num_terms
+
+    def add(self, word, term_id):
+        if self.root is None:
+            self.root = [word, term_id, {}]
+            self.num_nodes += 1
+            self.num_terms += 1
+            return
+
+        node = self.root
+        while True:
+            dist = self.distance(word, node[WORD])
+            if dist == 0:
+                # a removed node of the same word is reused
+                if node[TERM_ID] is None:
+                    self.num_terms += 1
+                node[TERM_ID] = term_id
+                return
+
+            child = node[CHILDREN].get(dist, None)
+            if child is None:
+                node[CHILDREN][dist] = [word, term_id, {}]
+                self.num_nodes += 1
+                self.num_terms += 1
+                return
+            node = child
+
+    def remove(self, word):
+        node = self.root
+        while node is not None:
+            dist = self.distance(word, node[WORD])
+            if dist == 0:
+                break
+            node = node[CHILDREN].get(dist, None)
+
+        if node is None or node[TERM_ID] is None:
+            raise Exception(f"The word '{word}' is not in the tree.")
+
+        node[TERM_ID] = None
+        self.num_terms -= 1
+        if self.num_nodes > 2 * self.num_terms:
+            self._rebuild()
+
+    def _rebuild(self):
+        terms = list(self.items())
+        self.root = None
+        self.num_nodes = self.num_terms = 0
+        for word, term_id in terms:
+            self.add(word, term_id)
+
+    def items(self):
+        """
+        Yields the (word, term_id) pairs of the terms in the tree.
+        """
+        nodes = [self.root] if self.root is not None else []
+        while nodes:
+            node = nodes.pop()
+            if node[TERM_ID] is not None:
+                yield node[WORD], node[TERM_ID]
+            nodes.extend(node[CHILDREN].values())
+
+    def search(self, word, radius):
+        """
+        Returns the term ids of the words within the radius of word.
+        """
+        term_ids = []
+        nodes = [self.root] if self.root is not None else []
+        while nodes:
+            node = nodes.pop()
+            dist = self.distance(word, node[WORD])
+            if dist <= radius and node[TERM_ID] is not None:
+                term_ids.append(node[TERM_ID])
+
+            low, high = dist - radius, dist + radius
+            for child_dist, child in node[CHILDREN].items():
+                if low <= child_dist <= high:
+                    nodes.append(child)
+        return term_ids
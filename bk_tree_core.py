@@ -0,0 +1,49 @@
+# Metric tree core: the distinct EDIT and HAMMING terms of a group (see registry_core.py) are kept in a BK-tree
+# (bk_tree.py), one per (match_type, match_dist), the HAMMING trees additionally per term length. Every distinct
+# document word of a batch is searched in every tree with the match_dist of the tree as radius.
+# The distances are computed by rapidfuzz.
+from rapidfuzz.distance import Hamming, Levenshtein
+
+from bk_tree import BKTree
+from core_utils import MatchType
+from registry_core import RegistryCore
+
+class BKTreeCore(RegistryCore):
+    def __init__(self):
+        super().__init__()
+        # (match_type, match_dist, term length or None) -> BKTree
+        self.trees = {}
+
+    def _add_term(self, group, term_id, term):
+        tree = self.trees.get(group, None)
+        if tree is None:
+            # the hamming distance is only a metric on words of the same length, the group has one length
+            tree = self.trees[group] = BKTree(Hamming.distance if group[0] == MatchType.HAMMING else Levenshtein.distance)
+        tree.add(term, term_id)
+
+    def _remove_term(self, group, term_id, term):
+        tree = self.trees[group]
+        tree.remove(term)
+        if not tree:
+            del self.trees[group]
+
+    def _clear_terms(self):
+        self.trees.clear()
+
+    def _find_word_matches(self, word):
+        """
+        Returns the ids of the EDIT and HAMMING terms that match the document word.
+        """
+        term_ids = []
+        for (match_type, match_dist, term_length), tree in self.trees.items():
+            if term_length is None or term_length == len(word):
+                term_ids.extend(tree.search(word, match_dist))
+        return term_ids
+
+    def _get_term_stats(self):
+        # the nodes include the removed terms
+        return {
+            'trees': len(self.trees),
+            'tree_nodes': sum(tree.num_nodes for tree in self.trees.values()),
+            'tree_terms': sum(len(tree) for tree in self.trees.values()),
+        }
@@ -0,0 +1,64 @@
+# Runtime statistics of the matching path: counters, per phase timers and the slowest document words.
+# The counters are only touched when a CoreStats object is passed in, without it the hot path is unchanged.
+# Phases: generation (deletions of the document words), lookup (probing the index and scanning the postings),
+# verify (edit distance of the EDIT candidates) and combine (fanning the term hits out to the queries).
+import heapq
+import logging
+import time
+
+COUNTERS = ["documents", "document_words", "distinct_words", "deletions", "probes", "postings_scanned", "hits", "results"]
+PHASES = ["generation", "lookup", "verify", "combine"]
+# the number of slowest words that are kept
+NUM_SLOWEST_WORDS = 10
+
+class CoreStats:
+    def __init__(self, dump_interval=None):
+        # with a dump_interval (in seconds) the statistics are logged periodically, see maybe_dump
+        self.dump_interval = dump_interval
+        self.reset()
+
+    def reset(self):
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.verifications = [0, 0, 0]  # per MatchType value
+        self.phase_times = dict.fromkeys(PHASES, 0.0)
+        self.slowest_words = []  # min heap of (lookup time, word, number of hits)
+        self.last_dump = time.perf_counter()
+
+    def add_word_time(self, word_time, word, num_hits):
+        if len(self.slowest_words) < NUM_SLOWEST_WORDS:
+            heapq.heappush(self.slowest_words, (word_time, word, num_hits))
+        elif word_time > self.slowest_words[0][0]:
+            heapq.heapreplace(self.slowest_words, (word_time, word, num_hits))
+
+    def merge(self, other):
+        """
+        Adds the statistics of another CoreStats, as returned by to_dict (e.g. of a worker process).
+        """
+        for name, count in other['counters'].items():
+            self.counters[name] += count
+        for match_type, count in enumerate(other['verifications']):
+            self.verifications[match_type] += count
+        for phase, phase_time in other['phase_times'].items():
+            self.phase_times[phase] += phase_time
+        for word_time, word, num_hits in other['slowest_words']:
+            self.add_word_time(word_time, word, num_hits)
+
+    def to_dict(self):
+        return {
+            'counters': dict(self.counters),
+            'verifications': list(self.verifications),
+            'phase_times': dict(self.phase_times),
+            'slowest_words': sorted(self.slowest_words, reverse=True),
+        }
+
+    def maybe_dump(self, get_stats):
+        """
+        Logs get_stats() if the dump interval has passed since the last dump.
+        """
+        if self.dump_interval is None:
+            return
+
+        now = time.perf_counter()
+        if now - self.last_dump >= self.dump_interval:
+            self.last_dump = now
+            logging.info(f"Core stats: {get_stats()}")
@@ -1,14 +1,20 @@
 # we simply overwrite some functions from max_throughput_core.py and reference_core.py in dask_core.py
-from core_utils import ErrorCode
 from max_throughput_core import MaxThroughputCore
-from dask_utils import find_document_matches_dask
 
 class DaskCore(MaxThroughputCore):
-    def match_document(self, doc_id, content):
-        """
-        Matches a document against all active queries and stores the result if matched.
-        """
-        trie_matches = list(find_document_matches_dask(self.trie, content.split(), self.queries))
-        self.results.append((doc_id, trie_matches))
-        
-        return ErrorCode.EC_SUCCESS
\ No newline at end of file
+    def __init__(self, num_workers=4, index_backend="hash", scheduler="distributed", num_partitions=None, address=None,
+                 collect_stats=False, **kwargs):
+        # the documents are matched by dask instead of the worker pool, see dask_utils.py.
+        # scheduler: "distributed" (actors on a local cluster or on the cluster at address), "threads", "processes" or "synchronous".
+        # num_partitions: the distinct words of a batch are split into this many tasks (default: num_workers).
+        super().__init__(num_workers=num_workers, index_backend=index_backend, collect_stats=collect_stats, **kwargs)
+        self.scheduler = scheduler
+        self.num_partitions = num_partitions
+        self.address = address
+
+    def _create_worker_pool(self):
+        from dask_utils import DaskWorkerPool
+
+        return DaskWorkerPool(self.num_workers, self.trie, self.index_backend, collect_stats=self.stats is not None,
+                              scheduler=self.scheduler, num_partitions=self.num_partitions, address=self.address,
+                              signature_threshold=self.signature_threshold)
@@ -1,19 +1,153 @@
 # the overhead from the imports alone is so high that it's worth it to put them in a separate file
-from dask import delayed, compute
+#
+# Worker pool of the dask core, it has the same interface as the WorkerPool of worker_pool.py.
+# scheduler "distributed": every worker of a (local) dask cluster holds a copy of the index in an actor. The index is
+# built up once from the term deltas, the deltas of the query changes are sent to the actors before the next batch.
+# The distinct words of a batch are split into num_partitions partitions, which are matched by the actors in parallel.
+# scheduler "threads", "processes" or "synchronous": the words are matched as a dask.bag of num_partitions partitions
+# on the index of the core (main process). The "processes" scheduler has to ship (pickle) the index with every batch.
+from dask import bag, delayed
 
-from trie_utils import find_partial_document_matches, combine_partial_document_matches
+from core_stats import CoreStats
+from partitioned_index import LengthPartitionedIndex, DEFAULT_SIGNATURE_THRESHOLD
+from trie_utils import find_words_matches
+from worker_pool import apply_index_update, save_index_snapshot
 
-def find_document_matches_dask(trie, doc_words, reference_queries):
-    num_cores = 4
+class IndexActor:
+    """
+    Copy of the index on a dask worker.
+    """
+    def __init__(self, index_backend, collect_stats, signature_threshold):
+        self.trie = LengthPartitionedIndex(index_backend, CoreStats() if collect_stats else None, signature_threshold)
 
-    partial_doc_words = [doc_words[i::num_cores] for i in range(num_cores)]
-    inputs = [(trie, partial_doc_word, reference_queries) for partial_doc_word in partial_doc_words]
+    def apply_index_updates(self, index_updates):
+        for command, payload in index_updates:
+            apply_index_update(self.trie, command, payload)
 
-    partial_found_query_words_dicts = [delayed(find_partial_document_matches(input)) for input in inputs]
+    def find_words_matches(self, doc_words):
+        return find_words_matches(self.trie, doc_words)
 
-    # let's compute it all in parallel:
-    partial_found_query_words_dicts = compute(*partial_found_query_words_dicts)
+    def get_stats(self):
+        return self.trie.runtime_stats.to_dict() if self.trie.runtime_stats is not None else None
 
-    doc_matches = combine_partial_document_matches(partial_found_query_words_dicts, reference_queries)
+    def reset_stats(self):
+        if self.trie.runtime_stats is not None:
+            self.trie.runtime_stats.reset()
 
-    return doc_matches
\ No newline at end of file
+    def get_index_size(self):
+        return self.trie.size()
+
+    def save_snapshot(self, payload):
+        return save_index_snapshot(self.trie, payload)
+
+def _find_partition_matches(doc_words, trie):
+    # a bag partition is a list of words
+    return [find_words_matches(trie, doc_words)]
+
+class DaskWorkerPool:
+    def __init__(self, num_workers, trie, index_backend="hash", collect_stats=False, scheduler="distributed", num_partitions=None, address=None,
+                 signature_threshold=DEFAULT_SIGNATURE_THRESHOLD):
+        # trie is the index of the core, it is only used by the local schedulers
+        self.trie = trie
+        self.scheduler = scheduler
+        self.num_partitions = num_partitions or max(num_workers, 1)
+        self.client = None
+        self.cluster = None
+        self.actors = []
+        # updates (command, payload) that are not yet sent to the actors
+        self.index_updates = []
+
+        if scheduler == "distributed":
+            from dask.distributed import Client, LocalCluster
+
+            if address is None:
+                # one single threaded process per worker, the matching holds the GIL
+                self.cluster = LocalCluster(n_workers=max(num_workers, 1), threads_per_worker=1, processes=True, dashboard_address=None)
+                self.client = Client(self.cluster)
+            else:
+                self.client = Client(address)
+
+            workers = list(self.client.scheduler_info()['workers'])
+            self.actors = [self.client.submit(IndexActor, index_backend, collect_stats, signature_threshold, actor=True, workers=[worker]).result()
+                           for worker in workers]
+        elif scheduler not in ("threads", "processes", "synchronous"):
+            raise Exception(f"Unknown dask scheduler '{scheduler}'.")
+
+        # the actors hold the index, the local schedulers match on the index of the core
+        self.has_index = bool(self.actors)
+
+    def _update_index(self, command, payload):
+        # the index of the core is already up to date
+        if self.actors:
+            self.index_updates.append((command, payload))
+
+    def _flush_index_updates(self):
+        # the actors have to apply the updates before they match the next batch
+        if self.index_updates:
+            futures = [actor.apply_index_updates(self.index_updates) for actor in self.actors]
+            for future in futures:
+                future.result()
+            self.index_updates = []
+
+    def add_term(self, term_id, term, match_type, match_dist):
+        self._update_index("add_term", (term_id, term, match_type, match_dist))
+
+    def remove_term(self, term_id, term, match_type, match_dist):
+        self._update_index("remove_term", (term_id, term, match_type, match_dist))
+
+    def load_snapshot(self, snapshot_fp):
+        # the workers of a local cluster can map the file themselves
+        self._update_index("load_snapshot", snapshot_fp)
+
+    def find_words_matches(self, doc_words):
+        """
+        Splits the (distinct) document words into partitions and returns the hits of every word.
+        """
+        doc_words = list(doc_words)
+        num_partitions = max(min(self.num_partitions, len(doc_words)), 1)
+
+        if not self.actors:
+            # with a name dask does not tokenize (pickle) the whole index
+            trie = delayed(self.trie, name=f"index-{id(self.trie)}")
+            partial_words_matches = bag.from_sequence(doc_words, npartitions=num_partitions).map_partitions(
+                _find_partition_matches, trie).compute(scheduler=self.scheduler)
+        else:
+            self._flush_index_updates()
+            # the partitions are dealt out to the actors, all of them are matched at the same time
+            futures = [self.actors[i % len(self.actors)].find_words_matches(doc_words[i::num_partitions]) for i in range(num_partitions)]
+            partial_words_matches = [future.result() for future in futures]
+
+        words_matches = {}
+        for partial_words_match in partial_words_matches:
+            words_matches.update(partial_words_match)
+        return words_matches
+
+    def get_stats(self):
+        """
+        Returns the statistics (CoreStats.to_dict) of every actor. The local schedulers count in the stats of the core.
+        """
+        return [future.result() for future in [actor.get_stats() for actor in self.actors]]
+
+    def reset_stats(self):
+        for future in [actor.reset_stats() for actor in self.actors]:
+            future.result()
+
+    def get_index_size(self):
+        # all actors hold the same index
+        self._flush_index_updates()
+        return self.actors[0].get_index_size().result()
+
+    def save_snapshot(self, snapshot_fp, queries, term_registry):
+        self._flush_index_updates()
+        error = self.actors[0].save_snapshot((snapshot_fp, queries, term_registry)).result()
+        if error is not None:
+            raise error
+
+    def close(self):
+        self.actors = []
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+        if self.cluster is not None:
+            self.cluster.close()
+            self.cluster = None
@@ -0,0 +1,105 @@
+# Generation of the deletion variants from precomputed per-length tables.
+# For every word length and maximum distance the masks (bit i set: character i is deleted) and the kept positions
+# of every mask are computed once. A variant of a single word is then one C level gather and join per mask,
+# a batch of words of the same length is gathered at once with numpy.
+from functools import lru_cache
+import itertools
+from operator import itemgetter
+
+import numpy as np
+
+# batches of at least this many words of the same length are generated with numpy
+MIN_NUMPY_BATCH = 64
+
+def _no_characters(word):
+    return ()
+
+class DeletionTable:
+    """
+    The masks of a word length with at most max_dist deleted positions, ordered by the number of deletions.
+    """
+    def __init__(self, word_length, max_dist):
+        self.word_length = word_length
+        self.masks = []
+        # per mask a function that returns the kept characters of a word
+        self.getters = []
+        # number of deletions -> (masks, kept positions as a (number of masks, kept length) array)
+        self.deletion_groups = []
+
+        for num_deleted in range(min(max_dist, word_length) + 1):
+            group_masks = []
+            group_kept_positions = []
+            for deleted_positions in itertools.combinations(range(word_length), num_deleted):
+                mask = sum(1 << position for position in deleted_positions)
+                kept_positions = [position for position in range(word_length) if not mask >> position & 1]
+                group_masks.append(mask)
+                group_kept_positions.append(kept_positions)
+                # itemgetter of one position returns the character itself, which joins the same
+                self.getters.append(itemgetter(*kept_positions) if kept_positions else _no_characters)
+
+            self.masks.extend(group_masks)
+            self.deletion_groups.append((group_masks, np.array(group_kept_positions, dtype=np.intp).reshape(len(group_masks), word_length - num_deleted)))
+
+        self.mask_getters = dict(zip(self.masks, self.getters))
+
+@lru_cache(maxsize=None)
+def get_deletion_table(word_length, max_dist):
+    return DeletionTable(word_length, max_dist)
+
+def get_deletion(word, mask):
+    """
+    Returns the word without the characters of the mask.
+    """
+    getter = get_deletion_table(len(word), 3).mask_getters.get(mask, None)
+    if getter is None:
+        # masks with more than 3 deletions are not in the table
+        return "".join([letter for index, letter in enumerate(word) if not mask >> index & 1])
+    return "".join(getter(word))
+
+def get_word_deletions(word, max_dist):
+    """
+    Returns the (variant, mask) pairs of a word with at most max_dist deleted characters.
+    """
+    table = get_deletion_table(len(word), max_dist)
+    return list(zip(["".join(getter(word)) for getter in table.getters], table.masks))
+
+def get_batch_deletions(words, max_dist):
+    """
+    Returns the (variant, mask, word) triples of a batch of words of the same length.
+    The characters (utf-32 codes) of all words are gathered for all masks with one numpy indexing per number
+    of deletions, the rows are then read back as fixed length strings.
+    """
+    word_length = len(words[0])
+    table = get_deletion_table(word_length, max_dist)
+    codes = np.frombuffer("".join(words).encode("utf-32-le"), dtype=np.uint32).reshape(len(words), word_length)
+
+    deletions = []
+    for group_masks, kept_positions in table.deletion_groups:
+        variant_length = kept_positions.shape[1]
+        if variant_length == 0:
+            deletions.extend(("", mask, word) for word in words for mask in group_masks)
+            continue
+
+        # (words, masks, kept characters) -> (words, masks) strings
+        variants = np.ascontiguousarray(codes[:, kept_positions]).view(f"<U{variant_length}").reshape(len(words), len(group_masks))
+        for word, word_variants in zip(words, variants.tolist()):
+            deletions.extend(zip(word_variants, group_masks, itertools.repeat(word)))
+    return deletions
+
+def get_deletions(words, max_dist):
+    """
+    Returns the (variant, mask, word) triples of all words, the words of a length are batched if there are enough.
+    """
+    length_words = {}
+    for word in dict.fromkeys(words):
+        length_words.setdefault(len(word), []).append(word)
+
+    deletions = []
+    for same_length_words in length_words.values():
+        if len(same_length_words) >= MIN_NUMPY_BATCH:
+            deletions.extend(get_batch_deletions(same_length_words, max_dist))
+            continue
+
+        for word in same_length_words:
+            deletions.extend((variant, mask, word) for variant, mask in get_word_deletions(word, max_dist))
+    return deletions
@@ -0,0 +1,130 @@
+# Vectorized verification of the HAMMING terms with numpy, an alternative to the deletion index for them.
+# Hamming matches need words of equal length, so the terms are grouped by length and encoded as matrices of
+# character codes. All distinct document words of a batch with the same length are compared with all terms of
+# that length at once. Words of up to 8 characters are packed into one uint64, the mismatching characters are
+# then counted with xor and popcount.
+import time
+
+import numpy as np
+
+from core_utils import MatchType
+
+# the words x terms comparisons are split into chunks of at most this many elements
+MAX_CHUNK_ELEMENTS = 1 << 22
+
+LOW_7_BITS = np.uint64(0x7F7F7F7F7F7F7F7F)
+HIGH_BITS = np.uint64(0x8080808080808080)
+LOW_BYTE_BITS = np.uint64(0x0101010101010101)
+
+def encode_words(words, length):
+    """
+    Returns the character codes of words of the same length as a (len(words), length) matrix.
+    """
+    try:
+        return np.frombuffer("".join(words).encode("latin-1"), dtype=np.uint8).reshape(len(words), length)
+    except UnicodeEncodeError:
+        return np.frombuffer("".join(words).encode("utf-32-le"), dtype=np.uint32).reshape(len(words), length)
+
+def pack_words(codes):
+    """
+    Packs a matrix of up to 8 uint8 character codes per word into one uint64 per word.
+    """
+    packed = np.zeros((codes.shape[0], 8), dtype=np.uint8)
+    packed[:, :codes.shape[1]] = codes
+    return packed.view(np.uint64).ravel()
+
+def sum_byte_high_bits(values):
+    # counts the set bits of values that only have the high bits of their bytes set, for numpy < 2.0:
+    # they are moved to the low bits and the multiplication sums all bytes up in the top byte
+    return ((values >> np.uint64(7)) * LOW_BYTE_BITS) >> np.uint64(56)
+
+# np.bitwise_count (popcount) needs numpy 2.0
+count_high_bits = getattr(np, "bitwise_count", sum_byte_high_bits)
+
+def count_packed_mismatches(packed_words, packed_terms):
+    # a byte of the xor is not 0 if the characters differ: adding 0x7F to its low 7 bits or the byte itself sets its high bit
+    xor = packed_words[:, None] ^ packed_terms[None, :]
+    return count_high_bits(((xor & LOW_7_BITS) + LOW_7_BITS | xor) & HIGH_BITS)
+
+def count_mismatches(word_codes, term_codes):
+    return (word_codes[:, None, :] != term_codes[None, :, :]).sum(axis=2, dtype=np.uint16)
+
+class HammingVerifier:
+    def __init__(self, runtime_stats=None):
+        # the compared (word, term) pairs and the time are counted in the CoreStats, if given
+        self.runtime_stats = runtime_stats
+        self.length_terms = {}  # term length -> {term_id: (term, match_dist)}
+        # term length -> (term ids, terms, match dists, codes), rebuilt after the terms of the length changed
+        self.length_arrays = {}
+
+    def add_term(self, term_id, term, match_dist):
+        self.length_terms.setdefault(len(term), {})[term_id] = (term, match_dist)
+        self.length_arrays.pop(len(term), None)
+
+    def remove_term(self, term_id, term):
+        terms = self.length_terms[len(term)]
+        del terms[term_id]
+        if not terms:
+            del self.length_terms[len(term)]
+        self.length_arrays.pop(len(term), None)
+
+    def has_term(self, term_id, term):
+        return term_id in self.length_terms.get(len(term), ())
+
+    def clear(self):
+        self.length_terms.clear()
+        self.length_arrays.clear()
+
+    def _get_length_arrays(self, term_length):
+        arrays = self.length_arrays.get(term_length, None)
+        if arrays is None:
+            terms = self.length_terms[term_length]
+            term_ids = list(terms)
+            words = [terms[term_id][0] for term_id in term_ids]
+            codes = encode_words(words, term_length)
+            if term_length <= 8 and codes.dtype == np.uint8:
+                codes = pack_words(codes)
+
+            match_dists = np.array([terms[term_id][1] for term_id in term_ids], dtype=np.uint8)
+            arrays = self.length_arrays[term_length] = (term_ids, words, match_dists, codes)
+        return arrays
+
+    def find_words_matches(self, doc_words):
+        """
+        Returns the (term_id, term) hits of every distinct document word, like find_words_matches of trie_utils.py.
+        """
+        length_words = {}
+        for word in set(doc_words):
+            if len(word) in self.length_terms:
+                length_words.setdefault(len(word), []).append(word)
+
+        verify_time = time.perf_counter()
+        words_matches = {}
+        for term_length, words in length_words.items():
+            term_ids, terms, match_dists, term_codes = self._get_length_arrays(term_length)
+            word_codes = encode_words(words, term_length)
+            packed = term_codes.ndim == 1
+            if packed:
+                if word_codes.dtype != np.uint8:
+                    # words with characters beyond latin-1 cannot match the packed terms
+                    continue
+                word_codes = pack_words(word_codes)
+
+            if self.runtime_stats is not None:
+                self.runtime_stats.verifications[MatchType.HAMMING.value] += len(words) * len(term_ids)
+
+            chunk_size = max(MAX_CHUNK_ELEMENTS // (len(term_ids) * (1 if packed else term_length)), 1)
+            for start in range(0, len(words), chunk_size):
+                chunk_codes = word_codes[start:start + chunk_size]
+                if packed:
+                    mismatches = count_packed_mismatches(chunk_codes, term_codes)
+                else:
+                    mismatches = count_mismatches(chunk_codes, term_codes)
+
+                for word_index, term_index in zip(*np.nonzero(mismatches <= match_dists[None, :])):
+                    words_matches.setdefault(words[start + word_index], set()).add((term_ids[term_index], terms[term_index]))
+
+        if self.runtime_stats is not None:
+            self.runtime_stats.phase_times['verify'] += time.perf_counter() - verify_time
+            self.runtime_stats.counters['hits'] += sum(len(word_matches) for word_matches in words_matches.values())
+        return words_matches
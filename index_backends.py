@@ -0,0 +1,76 @@
+# Backends for the deletion index.
+# The trie functions only ever do exact key lookups (get / [] / []=) and never use a prefix operation,
+# so every mapping from a deletion variant to its posting rows can be used as index.
+# The postings themselves live in a columnar PostingStore next to the mapping.
+import sys
+import pygtrie
+
+from posting_store import PostingStore
+from trie_utils import input_query_in_trie, delete_query_from_trie, compact_trie, find_word_matches
+
+class DeletionIndexMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.postings = PostingStore()
+        # keys that still point to dead postings
+        self.dirty_keys = set()
+        # compact once this share of the live postings (and at least min_compaction_rows) is dead
+        self.compaction_ratio = 0.25
+        self.min_compaction_rows = 1024
+
+    def clear(self):
+        super().clear()
+        self.postings.clear()
+        self.dirty_keys.clear()
+
+    def compact(self):
+        compact_trie(self)
+
+    def insert_query(self, query_id, match_type, match_dist, words):
+        input_query_in_trie(self, query_id, match_type, match_dist, words)
+
+    def delete_query(self, query_id, match_type, match_dist, words):
+        delete_query_from_trie(self, query_id, words, match_type, match_dist)
+
+    def find_word_matches(self, word):
+        return find_word_matches(self, word)
+
+    def stats(self):
+        """
+        Returns the size of the index, the live and dead postings and the memory used per posting.
+        """
+        num_postings = len(self.postings)
+        posting_bytes = self.postings.memory_usage()
+        row_bytes = sum(sys.getsizeof(rows) for rows in self.values())
+
+        return {
+            'keys': len(self),
+            'postings': num_postings,
+            'dead_postings': self.postings.dead_rows,
+            'free_rows': len(self.postings.free_rows),
+            'dirty_keys': len(self.dirty_keys),
+            'posting_bytes': posting_bytes,
+            'row_bytes': row_bytes,
+            'memory_bytes': posting_bytes + row_bytes,
+            'bytes_per_posting': (posting_bytes + row_bytes) / num_postings if num_postings else 0.0,
+        }
+
+class CharTrieIndex(DeletionIndexMixin, pygtrie.CharTrie):
+    pass
+
+class HashIndex(DeletionIndexMixin, dict):
+    """
+    Flat hash map from deletion variant to posting rows. Avoids the per character nodes of the CharTrie.
+    """
+    pass
+
+INDEX_BACKENDS = {
+    "trie": CharTrieIndex,
+    "hash": HashIndex,
+}
+
+def create_index(backend="hash"):
+    if backend not in INDEX_BACKENDS:
+        raise Exception(f"Unknown index backend '{backend}'. Available: {list(INDEX_BACKENDS)}")
+
+    return INDEX_BACKENDS[backend]()
@@ -0,0 +1,95 @@
+# Cache for the matching path: document word -> set of (term_id, term) hits.
+# Document streams reuse a small vocabulary a lot, so most words do not have to be looked up again.
+from collections import OrderedDict
+
+class WordMatchCache:
+    def __init__(self, maxsize=100_000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()  # word -> (epoch, hits), ordered from least to most recently used
+        self.term_words = {}  # term_id -> cached words that hit this term
+        self.epoch = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, word):
+        """
+        Returns the cached hits of the word or None if the word is not (or no longer) cached.
+        """
+        entry = self.entries.get(word, None)
+
+        if entry is None or entry[0] != self.epoch:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(word)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, word, word_matches):
+        if self.maxsize <= 0:
+            return
+
+        word_matches = frozenset(word_matches)
+        if word in self.entries:
+            self._forget_word(word)
+
+        self.entries[word] = (self.epoch, word_matches)
+        for term_id, _ in word_matches:
+            self.term_words.setdefault(term_id, set()).add(word)
+
+        while len(self.entries) > self.maxsize:
+            self._forget_word(next(iter(self.entries)))
+            self.evictions += 1
+
+    def _forget_word(self, word):
+        _, word_matches = self.entries.pop(word)
+        for term_id, _ in word_matches:
+            words = self.term_words.get(term_id, None)
+            if words is not None:
+                words.discard(word)
+                if not words:
+                    del self.term_words[term_id]
+
+    def add_term(self, term_id):
+        """
+        A new term can match any cached word, so everything cached so far is outdated.
+        The entries are dropped lazily by comparing their epoch.
+        """
+        self.epoch += 1
+        self.term_words.clear()
+        self.invalidations += 1
+
+    def remove_term(self, term_id):
+        """
+        Only the entries that contain the term have to be updated.
+        """
+        for word in self.term_words.pop(term_id, ()):
+            epoch, word_matches = self.entries[word]
+            self.entries[word] = (epoch, frozenset(match for match in word_matches if match[0] != term_id))
+
+    def clear(self):
+        self.entries.clear()
+        self.term_words.clear()
+        self.epoch = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
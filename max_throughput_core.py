@@ -1,34 +1,185 @@
 from abstract_core import AbstractCore
-import pygtrie
+from collections import deque
+import queue
+import threading
+import time
 
-from trie_utils import input_query_in_trie, delete_query_from_trie, find_document_matches
+from trie_utils import find_words_matches
 from core_utils import MatchType, ErrorCode
+from worker_pool import WorkerPool
+from match_cache import WordMatchCache
+from partitioned_index import LengthPartitionedIndex, DEFAULT_SIGNATURE_THRESHOLD
+from term_registry import TermRegistry
+from snapshot_utils import write_snapshot, Snapshot
+from core_stats import CoreStats
+from hamming_verifier import HammingVerifier
 
 # Implementation for 1.2
 class MaxThroughputCore(AbstractCore):
-    def __init__(self):
+    def __init__(self, num_workers=4, cache_size=100_000, index_backend="hash",
+                 async_mode=False, max_queue_depth=10_000, max_batch_size=1000, blocking_results=True,
+                 collect_stats=False, stats_dump_interval=None, hamming_verifier="index",
+                 signature_threshold=DEFAULT_SIGNATURE_THRESHOLD):
+        # with num_workers <= 1 the documents are matched in the main process
+        self.num_workers = num_workers
+        # "hash" or "trie", see index_backends.py
+        self.index_backend = index_backend
+        # terms of at least this length are in the signature index instead of the deletion index, None disables it
+        self.signature_threshold = signature_threshold
         self.queries = {}
-        self.results = []
-        self.trie = pygtrie.CharTrie()
+        self.results = deque()
+        # results are appended by the matching thread in async mode
+        self.results_available = threading.Condition()
+        self.pending_documents = 0
+
+        # in async mode match_document only enqueues the document, a background thread matches it.
+        # enqueueing blocks once max_queue_depth documents are waiting.
+        # get_next_avail_res waits for the pending documents if blocking_results is set.
+        self.async_mode = async_mode
+        self.max_queue_depth = max_queue_depth
+        self.max_batch_size = max_batch_size
+        self.blocking_results = blocking_results
+        self.document_queue = None
+        self.match_thread = None
+        self.match_error = None
+
+        # counters and timers of the matching path (see core_stats.py), they cost about 10% throughput when collected.
+        # logged every stats_dump_interval seconds if set.
+        self.stats = CoreStats(stats_dump_interval) if collect_stats else None
+
+        # the index contains every distinct (term, match_type, match_dist) only once, identified by its term id.
+        # it is partitioned by term length, see partitioned_index.py. It stays empty while a worker pool holds the index.
+        self.term_registry = TermRegistry()
+        self.trie = LengthPartitionedIndex(index_backend, self.stats, signature_threshold)
+        self.worker_pool = None
+        # maps document words to their hits, the size should fit the vocabulary of the documents. 0 disables it.
+        self.match_cache = WordMatchCache(cache_size)
+        # "index": the HAMMING terms are in the deletion index like the others.
+        # "numpy": they are verified in batches with numpy instead (in the main process), see hamming_verifier.py
+        if hamming_verifier not in ("index", "numpy"):
+            raise Exception(f"Unknown hamming verifier '{hamming_verifier}'.")
+        self.hamming_verifier = HammingVerifier(self.stats) if hamming_verifier == "numpy" else None
 
     def initialize_index(self):
         """
         Clears all queries and results to initialize the indexing system.
+        Starts the worker pool, which stays alive until the index is destroyed.
         """
         self.queries.clear()
         self.results.clear()
-        self.trie = pygtrie.CharTrie()
+        self.term_registry.clear()
+        self.trie = LengthPartitionedIndex(self.index_backend, self.stats, self.signature_threshold)
+        self.match_cache.clear()
+        if self.hamming_verifier is not None:
+            self.hamming_verifier.clear()
+
+        self._stop_match_thread()
+        self._close_worker_pool()
+        self.worker_pool = self._create_worker_pool()
+
+        # started after the worker pool, so that the workers are not forked from a multithreaded process
+        if self.async_mode:
+            self._start_match_thread()
 
     def destroy_index(self):
         """
-        Clears the index, effectively the same as re-initializing.
+        Clears the index and shuts down the worker pool.
         """
-        self.initialize_index()
+        self._stop_match_thread()
+        self.queries.clear()
+        self.results.clear()
+        self.term_registry.clear()
+        self.trie = LengthPartitionedIndex(self.index_backend, self.stats, self.signature_threshold)
+        self.match_cache.clear()
+        if self.hamming_verifier is not None:
+            self.hamming_verifier.clear()
+        self._close_worker_pool()
+
+    def _start_match_thread(self):
+        self.document_queue = queue.Queue(maxsize=self.max_queue_depth)
+        self.match_error = None
+        self.match_thread = threading.Thread(target=self._match_loop, daemon=True)
+        self.match_thread.start()
+
+    def _stop_match_thread(self):
+        if self.match_thread is not None:
+            self.document_queue.put(None)
+            self.match_thread.join()
+            self.match_thread = None
+            self.document_queue = None
+        self.pending_documents = 0
+
+    def _match_loop(self):
+        while True:
+            document = self.document_queue.get()
+            if document is None:
+                self.document_queue.task_done()
+                break
+
+            # everything that is already waiting is matched in the same batch
+            batch = [document]
+            stop = False
+            while len(batch) < self.max_batch_size:
+                try:
+                    document = self.document_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if document is None:
+                    stop = True
+                    break
+                batch.append(document)
+
+            try:
+                batch_results = self._match_documents(batch)
+            except Exception as error:
+                # raised again in the caller thread
+                self.match_error = error
+                batch_results = []
+
+            with self.results_available:
+                self.results.extend(batch_results)
+                self.pending_documents -= len(batch)
+                self.results_available.notify_all()
+
+            for _ in range(len(batch) + stop):
+                self.document_queue.task_done()
+            if stop:
+                break
+
+    def _wait_for_pending_documents(self):
+        """
+        Waits until all enqueued documents are matched. Query changes must not overtake documents.
+        """
+        if self.document_queue is not None:
+            self.document_queue.join()
+        self._raise_match_error()
+
+    def _raise_match_error(self):
+        if self.match_error is not None:
+            error, self.match_error = self.match_error, None
+            raise error
+
+    def _create_worker_pool(self):
+        # the matching runs in the main process without a worker pool
+        if self.num_workers > 1:
+            return WorkerPool(self.num_workers, self.index_backend, collect_stats=self.stats is not None,
+                              signature_threshold=self.signature_threshold)
+        return None
+
+    def _pool_has_index(self):
+        # the workers keep their own copies of the index, the core then keeps none
+        return self.worker_pool is not None and self.worker_pool.has_index
+
+    def _close_worker_pool(self):
+        if self.worker_pool is not None:
+            self.worker_pool.close()
+            self.worker_pool = None
 
     def start_query(self, query_id, terms, match_type, match_dist):
         """
         Initializes a new query with the specified id, terms, match type, and distance.
         """
+        self._wait_for_pending_documents()
         if query_id in self.queries:
             return ErrorCode.EC_FAIL
         
@@ -39,40 +190,247 @@ class MaxThroughputCore(AbstractCore):
             'match_dist': match_dist
         }
 
-        input_query_in_trie(self.trie, query_id, match_type, match_dist, terms)
+        # only the terms that no other query uses yet have to be indexed
+        for term_id, term in self.term_registry.add_query(query_id, terms, match_type, match_dist):
+            self._add_term(term_id, term, match_type, match_dist)
+
         return ErrorCode.EC_SUCCESS
     
     def end_query(self, query_id):
         """
         Ends a query by removing it from the active query list.
         """
-        terms, match_type, match_dist = self.queries[query_id]['terms'], self.queries[query_id]['match_type'], self.queries[query_id]['match_dist']
-        delete_query_from_trie(self.trie, query_id, terms, match_type, match_dist)
-        
+        self._wait_for_pending_documents()
         if query_id not in self.queries:
             return ErrorCode.EC_FAIL
+
+        match_type, match_dist = self.queries[query_id]['match_type'], self.queries[query_id]['match_dist']
+
+        # only the terms that no other query uses anymore are removed from the index
+        for term_id, term in self.term_registry.remove_query(query_id):
+            self._remove_term(term_id, term, match_type.value, match_dist)
         
         del self.queries[query_id]
         
         return ErrorCode.EC_SUCCESS
+
+    def _add_term(self, term_id, term, match_type, match_dist):
+        self.match_cache.add_term(term_id)
+        if self.hamming_verifier is not None and MatchType(match_type) == MatchType.HAMMING:
+            self.hamming_verifier.add_term(term_id, term, match_dist)
+            return
+
+        if self._pool_has_index():
+            self.worker_pool.add_term(term_id, term, match_type, match_dist)
+        else:
+            self.trie.insert_query(term_id, match_type, match_dist, [term])
+
+    def _remove_term(self, term_id, term, match_type, match_dist):
+        self.match_cache.remove_term(term_id)
+        # a term of a loaded snapshot can be in the index even with the hamming verifier
+        if self.hamming_verifier is not None and self.hamming_verifier.has_term(term_id, term):
+            self.hamming_verifier.remove_term(term_id, term)
+            return
+
+        if self._pool_has_index():
+            self.worker_pool.remove_term(term_id, term, match_type, match_dist)
+        else:
+            self.trie.delete_query(term_id, match_type, match_dist, [term])
     
+    def save_snapshot(self, snapshot_fp):
+        """
+        Writes the queries, the term registry and the index into a snapshot file, see snapshot_utils.py.
+        """
+        self._wait_for_pending_documents()
+        if self._pool_has_index():
+            self.worker_pool.save_snapshot(snapshot_fp, self.queries, self.term_registry)
+        else:
+            write_snapshot(snapshot_fp, self.queries, self.term_registry, self.trie)
+        return ErrorCode.EC_SUCCESS
+
+    def load_snapshot(self, snapshot_fp):
+        """
+        Replaces all queries with the ones of a snapshot. The index is not rebuilt, its partitions are decoded
+        from the memory-mapped file when they are first used. The results are kept.
+        """
+        self._wait_for_pending_documents()
+        snapshot = Snapshot(snapshot_fp)
+        try:
+            queries = snapshot.read_queries()
+            terms = snapshot.read_terms()
+            index_terms = snapshot.read_index_terms(terms)
+        except Exception:
+            snapshot.close()
+            raise
+
+        self.queries = {query_id: {'terms': query_terms, 'match_type': MatchType(match_type), 'match_dist': match_dist}
+                        for query_id, (query_terms, match_type, match_dist) in queries.items()}
+        self.term_registry.restore(terms, queries, snapshot.next_term_id)
+        self.match_cache.clear()
+        if self._pool_has_index():
+            # every worker maps the file itself
+            snapshot.close()
+            self.worker_pool.load_snapshot(snapshot_fp)
+        else:
+            self.trie.load_snapshot(snapshot, index_terms)
+
+        # the terms without postings were verified by the hamming verifier of the core that wrote the snapshot
+        if self.hamming_verifier is not None:
+            self.hamming_verifier.clear()
+        for term_id, (term, match_type, match_dist) in terms.items():
+            if term_id not in index_terms:
+                self._add_term(term_id, term, match_type, match_dist)
+
+        return ErrorCode.EC_SUCCESS
+
     def match_document(self, doc_id, content):
         """
         Matches a document against all active queries and stores the result if matched.
         """
-        trie_matches = list(find_document_matches(self.trie, content.split(), self.queries))
-        self.results.append((doc_id, trie_matches))
-        
+        return self.match_documents([(doc_id, content)])
+
+    def match_documents(self, batch):
+        """
+        Matches a batch of (doc_id, content) documents. Every distinct word of the batch is looked up once.
+        In async mode the documents are only enqueued.
+        """
+        if self.document_queue is None:
+            batch_results = self._match_documents(batch)
+            with self.results_available:
+                self.results.extend(batch_results)
+            return ErrorCode.EC_SUCCESS
+
+        self._raise_match_error()
+        for document in batch:
+            with self.results_available:
+                self.pending_documents += 1
+            # blocks while the queue is full
+            self.document_queue.put(document)
+
         return ErrorCode.EC_SUCCESS
+
+    def _match_documents(self, batch):
+        batch_words = [set(content.split()) for _, content in batch]
+        distinct_words = set().union(*batch_words)
+        words_matches = self._find_words_matches(distinct_words)
+
+        combine_time = time.perf_counter()
+        batch_results = []
+        for (doc_id, _), doc_words in zip(batch, batch_words):
+            found_term_ids = {term_id for word in doc_words for term_id, _ in words_matches.get(word, ())}
+            batch_results.append((doc_id, self.term_registry.get_query_matches(found_term_ids)))
+
+        if self.stats is not None:
+            self.stats.phase_times['combine'] += time.perf_counter() - combine_time
+            counters = self.stats.counters
+            counters['documents'] += len(batch)
+            # the distinct words of every document
+            counters['document_words'] += sum(len(doc_words) for doc_words in batch_words)
+            counters['distinct_words'] += len(distinct_words)
+            counters['results'] += sum(len(matched_queries) for _, matched_queries in batch_results)
+            self.stats.maybe_dump(self._get_stats)
+
+        return batch_results
+
+    def _find_words_matches(self, doc_words):
+        """
+        Looks up the hits of the distinct document words, only the words that are not cached are matched.
+        """
+        words_matches = {}
+        missing_words = []
+        for word in doc_words:
+            word_matches = self.match_cache.get(word)
+            if word_matches is None:
+                missing_words.append(word)
+            elif word_matches:
+                words_matches[word] = word_matches
+
+        if missing_words:
+            found_words_matches = self._match_words(missing_words)
+            for word in missing_words:
+                word_matches = found_words_matches.get(word, set())
+                self.match_cache.put(word, word_matches)
+                if word_matches:
+                    words_matches[word] = word_matches
+
+        return words_matches
+
+    def _match_words(self, doc_words):
+        """
+        Looks up the words in the index, on the workers if there are any, and in the hamming verifier.
+        """
+        if self.worker_pool is not None:
+            words_matches = self.worker_pool.find_words_matches(doc_words)
+        else:
+            words_matches = find_words_matches(self.trie, doc_words)
+
+        if self.hamming_verifier is not None:
+            for word, word_matches in self.hamming_verifier.find_words_matches(doc_words).items():
+                words_matches.setdefault(word, set()).update(word_matches)
+        return words_matches
     
     def get_next_avail_res(self):
         """
         Retrieves the next available result for delivery.
         """
-        if not self.results:
-            return ErrorCode.EC_NO_AVAIL_RES, None, None, None
+        with self.results_available:
+            while not self.results and self.blocking_results and self.pending_documents > 0 and self.match_error is None:
+                self.results_available.wait()
+
+            if not self.results:
+                self._raise_match_error()
+                return ErrorCode.EC_NO_AVAIL_RES, None, None, None
+
+            doc_id, matched_queries = self.results.popleft()
+
+        return ErrorCode.EC_SUCCESS, doc_id, len(matched_queries), matched_queries
+
+    def get_available_results(self, max_results=None):
+        """
+        Retrieves all results that are available right now (at most max_results) as (doc_id, num_res, query_ids).
+        """
+        with self.results_available:
+            num_results = len(self.results) if max_results is None else min(max_results, len(self.results))
+            batch_results = [self.results.popleft() for _ in range(num_results)]
 
-        doc_id, matched_queries = self.results.pop(0)
+        self._raise_match_error()
+        return [(doc_id, len(matched_queries), matched_queries) for doc_id, matched_queries in batch_results]
 
-        matched_queries = set(matched_queries)
-        return ErrorCode.EC_SUCCESS, doc_id, len(matched_queries), matched_queries
\ No newline at end of file
+    def get_stats(self):
+        """
+        Returns the counters and timers of the matching path (summed over the workers) together with the size of
+        the index, the term registry and the cache. Without collect_stats only the sizes are returned.
+        """
+        self._wait_for_pending_documents()
+        return self._get_stats()
+
+    def _get_stats(self):
+        core_stats = {
+            'index': self.worker_pool.get_index_size() if self._pool_has_index() else self.trie.size(),
+            'queries': self.term_registry.stats(),
+            'cache': self.match_cache.stats(),
+        }
+        if self.stats is None:
+            return core_stats
+
+        stats = CoreStats()
+        stats.merge(self.stats.to_dict())
+        if self.worker_pool is not None:
+            for worker_stats in self.worker_pool.get_stats():
+                if worker_stats is not None:
+                    stats.merge(worker_stats)
+
+        stats_dict = stats.to_dict()
+        stats_dict['verifications'] = {match_type.name: stats_dict['verifications'][match_type.value] for match_type in MatchType}
+        return {**stats_dict, **core_stats}
+
+    def reset_stats(self):
+        """
+        Resets the counters and timers, also the ones of the workers and the cache.
+        """
+        self._wait_for_pending_documents()
+        if self.stats is not None:
+            self.stats.reset()
+        if self.worker_pool is not None:
+            self.worker_pool.reset_stats()
+        self.match_cache.reset_stats()
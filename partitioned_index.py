@@ -0,0 +1,253 @@
+# Deletion index that is partitioned by the length of the indexed (original) term.
+# Hamming matches need words of equal length and an edit distance d allows a length difference of at most d,
+# so a document word only has to be looked up in the partitions of the lengths it can reach.
+# Document words that cannot reach any partition are skipped before their deletions are generated.
+# The deletions of a document word are only generated as deep as the live distances of the reachable terms require.
+# A partition that is loaded from a snapshot stays None until it is first used, see load_snapshot.
+# Terms of at least signature_threshold characters are not in a deletion partition but in the signature index
+# (see signature_index.py), their deletion neighbourhood grows too large.
+import time
+
+from core_utils import MatchType
+from index_backends import create_index
+from signature_index import SignatureIndex
+from trie_utils import input_query_in_trie, delete_query_from_trie, find_word_in_trie
+from deletion_utils import get_word_deletions
+
+# terms of this length and longer are kept in the signature index
+DEFAULT_SIGNATURE_THRESHOLD = 10
+
+class LengthPartitionedIndex:
+    def __init__(self, backend="hash", runtime_stats=None, signature_threshold=DEFAULT_SIGNATURE_THRESHOLD):
+        self.backend = backend
+        # CoreStats of the lookups (see core_stats.py), None disables them
+        self.runtime_stats = runtime_stats
+        self.partitions = {}  # term length -> deletion index with the terms of that length
+        # None keeps all terms in the deletion partitions
+        self.signature_threshold = signature_threshold
+        self.signature_index = SignatureIndex()
+        # summary of the indexed terms
+        self.live_terms = {}  # (match_type, term length, match_dist) -> number of indexed terms
+        self.max_dists = {}  # (match_type, term length) -> maximum match_dist of the indexed terms
+        # document word length -> (deletion depth, partitions to probe per number of deleted characters).
+        # Cached until the summary of a reachable term length changes.
+        self.length_plans = {}
+        # the snapshot that the not yet decoded partitions are read from
+        self.snapshot = None
+
+    def load_snapshot(self, snapshot, terms):
+        """
+        Replaces the index with the one of the snapshot. terms are the indexed terms: term_id -> (term, match_type, match_dist).
+        The partitions are decoded when they are first used, the snapshot is closed once all of them are decoded.
+        """
+        self.clear()
+        self.snapshot = snapshot
+        self.partitions = dict.fromkeys(snapshot.partition_lengths)
+
+        for term, match_type, match_dist in terms.values():
+            key = (match_type, len(term), match_dist)
+            self.live_terms[key] = self.live_terms.get(key, 0) + 1
+        for match_type, term_length, match_dist in self.live_terms:
+            key = (match_type, term_length)
+            self.max_dists[key] = max(self.max_dists.get(key, 0), match_dist)
+
+        if not self.partitions:
+            self._close_snapshot()
+
+    def _close_snapshot(self):
+        if self.snapshot is not None:
+            self.snapshot.close()
+            self.snapshot = None
+
+    def get_partition(self, term_length):
+        partition = self.partitions[term_length]
+        if partition is None:
+            partition = self.partitions[term_length] = self.snapshot.read_partition(term_length, self.backend)
+            if None not in self.partitions.values():
+                self._close_snapshot()
+        return partition
+
+    def insert_query(self, query_id, match_type, match_dist, words):
+        match_type = MatchType(match_type).value
+
+        for term_length, length_words in self._group_by_length(words).items():
+            if self._is_signature_length(term_length):
+                for word in length_words:
+                    self.signature_index.insert(query_id, match_type, match_dist, word)
+            else:
+                if term_length in self.partitions:
+                    partition = self.get_partition(term_length)
+                else:
+                    partition = self.partitions[term_length] = create_index(self.backend)
+                input_query_in_trie(partition, query_id, match_type, match_dist, length_words)
+
+            self._update_live_terms(match_type, term_length, match_dist, len(length_words))
+
+    def delete_query(self, query_id, match_type, match_dist, words):
+        match_type = MatchType(match_type).value
+
+        for term_length, length_words in self._group_by_length(words).items():
+            self._update_live_terms(match_type, term_length, match_dist, -len(length_words))
+            # a partition of a snapshot can still hold terms above the threshold
+            if term_length not in self.partitions:
+                for word in length_words:
+                    self.signature_index.delete(query_id, match_type, match_dist, word)
+                continue
+
+            partition = self.get_partition(term_length)
+            delete_query_from_trie(partition, query_id, length_words, match_type, match_dist)
+            if not partition.postings:
+                del self.partitions[term_length]
+
+    def _is_signature_length(self, term_length):
+        # the terms of an existing partition (e.g. of a snapshot) stay in it
+        return self.signature_threshold is not None and term_length >= self.signature_threshold and term_length not in self.partitions
+
+    def _group_by_length(self, words):
+        length_words = {}
+        for word in set(words):
+            length_words.setdefault(len(word), []).append(word)
+        return length_words
+
+    def _update_live_terms(self, match_type, term_length, match_dist, count):
+        key = (match_type, term_length, match_dist)
+        live_count = self.live_terms.get(key, 0) + count
+        if live_count > 0:
+            self.live_terms[key] = live_count
+        else:
+            del self.live_terms[key]
+
+        # the maximum only has to be recomputed for this type and length, there are at most 4 distances
+        live_dists = [dist for dist in range(4) if (match_type, term_length, dist) in self.live_terms]
+        if live_dists:
+            self.max_dists[(match_type, term_length)] = max(live_dists)
+        else:
+            self.max_dists.pop((match_type, term_length), None)
+
+        # only document words within the maximum distance of 3 can reach this term length
+        for word_length in range(max(term_length - 3, 0), term_length + 4):
+            self.length_plans.pop(word_length, None)
+
+    def _get_length_plan(self, word_length):
+        """
+        Returns the number of characters that have to be deleted at most from a document word of this length,
+        and for every number of deleted characters the partitions in which the deletion variants can hit.
+        A deletion depth of -1 means that the word cannot reach any indexed term.
+        """
+        plan = self.length_plans.get(word_length, None)
+        if plan is not None:
+            return plan
+
+        partition_probes = [[] for _ in range(4)]
+        for term_length in self.partitions:
+            edit_dist = self.max_dists.get((MatchType.EDIT.value, term_length), -1)
+            same_length_dist = -1
+            if term_length == word_length:
+                # exact and hamming matches delete the same positions of both words
+                same_length_dist = max(self.max_dists.get((MatchType.EXACT.value, term_length), -1),
+                                       self.max_dists.get((MatchType.HAMMING.value, term_length), -1))
+
+            for doc_deletions in range(4):
+                # the variants are only equal if the term has this many deletions
+                query_deletions = term_length - word_length + doc_deletions
+                if doc_deletions <= same_length_dist or (doc_deletions <= edit_dist and 0 <= query_deletions <= edit_dist):
+                    partition_probes[doc_deletions].append(self.get_partition(term_length))
+
+        deletion_depth = max((doc_deletions for doc_deletions in range(4) if partition_probes[doc_deletions]), default=-1)
+        plan = (deletion_depth, partition_probes)
+
+        self.length_plans[word_length] = plan
+        return plan
+
+    def find_word_matches(self, word):
+        """
+        Returns all (query_id, query_word) hits of a document word, only the compatible partitions are probed.
+        """
+        if self.runtime_stats is not None:
+            return self._find_word_matches_with_stats(word, self.runtime_stats)
+
+        word_matches = self.signature_index.find_word_matches(word) if self.signature_index else set()
+
+        deletion_depth, partition_probes = self._get_length_plan(len(word))
+        if deletion_depth < 0:
+            return word_matches
+
+        for doc_deleted_word_comb, mask in get_word_deletions(word, deletion_depth):
+            for partition in partition_probes[len(word) - len(doc_deleted_word_comb)]:
+                word_matches.update(find_word_in_trie(partition, doc_deleted_word_comb, mask, word))
+
+        return word_matches
+
+    def _find_word_matches_with_stats(self, word, stats):
+        # same as find_word_matches, but counts and times every phase
+        start_time = time.perf_counter()
+        verify_time = stats.phase_times['verify']
+        word_matches = set()
+
+        deletion_depth, partition_probes = self._get_length_plan(len(word))
+        if deletion_depth >= 0:
+            deletions = get_word_deletions(word, deletion_depth)
+            generation_time = time.perf_counter()
+            stats.phase_times['generation'] += generation_time - start_time
+            stats.counters['deletions'] += len(deletions)
+
+            for doc_deleted_word_comb, mask in deletions:
+                partitions = partition_probes[len(word) - len(doc_deleted_word_comb)]
+                stats.counters['probes'] += len(partitions)
+                for partition in partitions:
+                    word_matches.update(find_word_in_trie(partition, doc_deleted_word_comb, mask, word, stats))
+        else:
+            generation_time = start_time
+
+        if self.signature_index:
+            word_matches.update(self.signature_index.find_word_matches(word, stats))
+
+        end_time = time.perf_counter()
+        # the verifications are timed on their own
+        stats.phase_times['lookup'] += end_time - generation_time - (stats.phase_times['verify'] - verify_time)
+        stats.counters['hits'] += len(word_matches)
+        stats.add_word_time(end_time - start_time, word, len(word_matches))
+        return word_matches
+
+    def size(self):
+        """
+        Returns the number of keys and postings of the decoded partitions, without the memory use of stats().
+        """
+        partitions = [partition for partition in self.partitions.values() if partition is not None]
+        return {
+            'partitions': len(self.partitions),
+            'keys': sum(len(partition) for partition in partitions),
+            'postings': sum(len(partition.postings) for partition in partitions),
+            'dead_postings': sum(partition.postings.dead_rows for partition in partitions),
+            'signature_terms': len(self.signature_index),
+        }
+
+    def compact(self):
+        for term_length in self.partitions:
+            self.get_partition(term_length).compact()
+
+    def clear(self):
+        self._close_snapshot()
+        self.partitions.clear()
+        self.live_terms.clear()
+        self.max_dists.clear()
+        self.length_plans.clear()
+        self.signature_index.clear()
+
+    def stats(self):
+        partition_stats = [self.get_partition(term_length).stats() for term_length in self.partitions]
+        num_postings = sum(partition_stat['postings'] for partition_stat in partition_stats)
+        total_bytes = sum(partition_stat['posting_bytes'] + partition_stat['row_bytes'] for partition_stat in partition_stats)
+
+        return {
+            'partitions': len(self.partitions),
+            'keys': sum(partition_stat['keys'] for partition_stat in partition_stats),
+            'postings': num_postings,
+            'dead_postings': sum(partition_stat['dead_postings'] for partition_stat in partition_stats),
+            'memory_bytes': total_bytes,
+            'bytes_per_posting': total_bytes / num_postings if num_postings else 0.0,
+            'live_terms': dict(self.live_terms),
+            # the term lengths from signature_threshold on are in the signature index
+            'signature_threshold': self.signature_threshold,
+            'signature_index': self.signature_index.stats(),
+        }
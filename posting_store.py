@@ -0,0 +1,147 @@
+# Columnar storage for the postings of the deletion index.
+# Instead of a tuple (query_id, query_type, query_dist, mask_str, original_word) per posting, every field is
+# kept in its own array of machine ints. The index keys only point to rows of these columns.
+# The masks are integers: bit i is set if the character at position i was deleted. They are stored as 64 bit
+# values, once a word longer than 64 characters is added the mask column becomes a list of python ints.
+#
+# Postings are removed through a reverse index query_id -> rows. The rows are only marked as dead (tombstone),
+# they are released for reuse once the index key no longer points to them (see compact_trie in trie_utils.py).
+# The interned words count the rows that use them and are released with their last row.
+from array import array
+import sys
+
+# query type of a removed posting
+TOMBSTONE = 0xFF
+# bits of a mask in the array column
+MASK_BITS = 64
+
+class PostingStore:
+    def __init__(self):
+        self.query_ids = array('I')
+        self.query_types = array('B')
+        self.query_dists = array('B')
+        self.masks = array('Q')
+        self.word_ids = array('I')
+
+        # interned query words, the postings only store the word id
+        self.words = []
+        self.word_to_id = {}
+        # word id -> number of rows (live or not yet released) that use the word
+        self.word_refs = array('I')
+        # ids of released words, they are reused by the next interned word
+        self.free_word_ids = []
+
+        # query_id -> rows of its postings
+        self.query_rows = {}
+        # number of rows that are removed but still referenced by an index key
+        self.dead_rows = 0
+        # rows of released postings, they are reused by the next append
+        self.free_rows = []
+
+    def intern_word(self, word):
+        word_id = self.word_to_id.get(word, None)
+        if word_id is None:
+            if self.free_word_ids:
+                word_id = self.free_word_ids.pop()
+                self.words[word_id] = word
+            else:
+                word_id = len(self.words)
+                self.words.append(word)
+                self.word_refs.append(0)
+            self.word_to_id[word] = word_id
+        self.word_refs[word_id] += 1
+        return word_id
+
+    def load_words(self, words):
+        """
+        Sets the interned words of the word_ids column, e.g. of a snapshot.
+        """
+        self.words = words
+        self.word_to_id = {word: word_id for word_id, word in enumerate(words)}
+        self.word_refs = array('I', bytes(len(words) * 4))
+        for word_id in self.word_ids:
+            self.word_refs[word_id] += 1
+        self.free_word_ids = []
+
+    def append(self, query_id, query_type, query_dist, mask, word):
+        """
+        Stores a posting and returns its row.
+        """
+        word_id = self.intern_word(word)
+        if mask >> MASK_BITS and isinstance(self.masks, array):
+            self.masks = self.masks.tolist()
+
+        if self.free_rows:
+            row = self.free_rows.pop()
+            self.query_ids[row] = query_id
+            self.query_types[row] = query_type
+            self.query_dists[row] = query_dist
+            self.masks[row] = mask
+            self.word_ids[row] = word_id
+        else:
+            row = len(self.query_ids)
+            self.query_ids.append(query_id)
+            self.query_types.append(query_type)
+            self.query_dists.append(query_dist)
+            self.masks.append(mask)
+            self.word_ids.append(word_id)
+
+        rows = self.query_rows.get(query_id, None)
+        if rows is None:
+            self.query_rows[query_id] = create_posting_rows([row])
+        else:
+            rows.append(row)
+        return row
+
+    def remove_query(self, query_id):
+        """
+        Marks all postings of the query as dead and returns their rows. O(1) per posting.
+        """
+        rows = self.query_rows.pop(query_id, ())
+        for row in rows:
+            self.query_types[row] = TOMBSTONE
+        self.dead_rows += len(rows)
+        return rows
+
+    def is_dead(self, row):
+        return self.query_types[row] == TOMBSTONE
+
+    def release(self, row):
+        # the row is dead and no index key points to it anymore
+        self.free_rows.append(row)
+        self.dead_rows -= 1
+
+        word_id = self.word_ids[row]
+        self.word_refs[word_id] -= 1
+        if not self.word_refs[word_id]:
+            del self.word_to_id[self.words[word_id]]
+            self.words[word_id] = None
+            self.free_word_ids.append(word_id)
+
+    def get(self, row):
+        return self.query_ids[row], self.query_types[row], self.query_dists[row], self.masks[row], self.words[self.word_ids[row]]
+
+    def __len__(self):
+        # the number of live postings
+        return len(self.query_ids) - len(self.free_rows) - self.dead_rows
+
+    def clear(self):
+        self.__init__()
+
+    def memory_usage(self):
+        """
+        Returns the bytes used by the columns, the reverse index and the interned words.
+        """
+        columns = (self.query_ids, self.query_types, self.query_dists, self.word_ids, self.word_refs)
+        column_bytes = sum(column.buffer_info()[1] * column.itemsize for column in columns)
+        if isinstance(self.masks, array):
+            column_bytes += self.masks.buffer_info()[1] * self.masks.itemsize
+        else:
+            column_bytes += sys.getsizeof(self.masks) + sum(sys.getsizeof(mask) for mask in self.masks)
+        reverse_bytes = sys.getsizeof(self.query_rows) + sum(sys.getsizeof(rows) for rows in self.query_rows.values())
+        word_bytes = sys.getsizeof(self.words) + sys.getsizeof(self.word_to_id) + sum(sys.getsizeof(word) for word in self.word_to_id)
+        return column_bytes + reverse_bytes + word_bytes
+
+def create_posting_rows(rows=()):
+    # the index keys map to the rows of their postings
+    return array('I', rows)
@@ -0,0 +1,77 @@
+# Brute force core on top of rapidfuzz: no deletion index, the distinct document words of a batch are compared
+# with all query terms by rapidfuzz.process.cdist (C++, multithreaded).
+# The distinct terms of a group (see registry_core.py) are kept in one array: per (match_type, match_dist), the
+# HAMMING terms additionally per length, rapidfuzz pads words of different length, which would count as mismatches.
+# The score_cutoff lets rapidfuzz stop a comparison as soon as the distance exceeds match_dist.
+import numpy as np
+from rapidfuzz.distance import Hamming, Levenshtein
+from rapidfuzz.process import cdist
+
+from core_utils import MatchType
+from registry_core import RegistryCore
+
+# the words x terms distance matrices are split into chunks of at most this many elements
+MAX_CHUNK_ELEMENTS = 1 << 24
+
+class RapidFuzzCore(RegistryCore):
+    def __init__(self, num_workers=-1):
+        super().__init__()
+        # threads of cdist, -1 uses all cores
+        self.num_workers = num_workers
+        # (match_type, match_dist, term length or None) -> {term_id: term}
+        self.term_groups = {}
+        # (match_type, match_dist, term length or None) -> (term ids, terms), rebuilt after the group changed
+        self.term_arrays = {}
+
+    def _add_term(self, group, term_id, term):
+        self.term_groups.setdefault(group, {})[term_id] = term
+        self.term_arrays.pop(group, None)
+
+    def _remove_term(self, group, term_id, term):
+        group_terms = self.term_groups[group]
+        del group_terms[term_id]
+        if not group_terms:
+            del self.term_groups[group]
+        self.term_arrays.pop(group, None)
+
+    def _clear_terms(self):
+        self.term_groups.clear()
+        self.term_arrays.clear()
+
+    def _get_term_arrays(self, group):
+        arrays = self.term_arrays.get(group, None)
+        if arrays is None:
+            group_terms = self.term_groups[group]
+            arrays = self.term_arrays[group] = (list(group_terms), list(group_terms.values()))
+        return arrays
+
+    def _find_words_matches(self, doc_words):
+        """
+        Returns the matched term ids of every distinct document word: word -> [term_id, ...].
+        """
+        words_matches = {}
+        length_words = {}
+        for word in doc_words:
+            length_words.setdefault(len(word), []).append(word)
+
+        for group in self.term_groups:
+            match_type, match_dist, term_length = group
+            words = doc_words if term_length is None else length_words.get(term_length, None)
+            if not words:
+                continue
+
+            term_ids, terms = self._get_term_arrays(group)
+            scorer = Hamming.distance if match_type == MatchType.HAMMING else Levenshtein.distance
+            chunk_size = max(MAX_CHUNK_ELEMENTS // len(terms), 1)
+
+            for start in range(0, len(words), chunk_size):
+                chunk_words = words[start:start + chunk_size]
+                # distances above the cutoff are returned as match_dist + 1
+                distances = cdist(chunk_words, terms, scorer=scorer, score_cutoff=match_dist, dtype=np.uint8, workers=self.num_workers)
+                for word_index, term_index in zip(*np.nonzero(distances <= match_dist)):
+                    words_matches.setdefault(chunk_words[word_index], []).append(term_ids[term_index])
+
+        return words_matches
+
+    def _get_term_stats(self):
+        return {'term_groups': len(self.term_groups)}
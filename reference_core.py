@@ -1,5 +1,7 @@
 from abstract_core import AbstractCore
 from core_utils import MatchType, ErrorCode
+from collections import deque
+from term_selectivity import TermSelectivity
 
 queries = {}  # Stores active queries
 results = []  # Stores matched results for retrieval
@@ -8,7 +10,9 @@ results = []  # Stores matched results for retrieval
 class ReferenceCore(AbstractCore):
     def __init__(self):
         self.queries = {}
-        self.results = []
+        self.results = deque()
+        # hit rates of the (term, match_type, match_dist) over the recent documents
+        self.term_selectivity = TermSelectivity()
 
     def initialize_index(self):
         """
@@ -16,6 +20,7 @@ class ReferenceCore(AbstractCore):
         """
         self.queries.clear()
         self.results.clear()
+        self.term_selectivity.clear()
 
     def destroy_index(self):
         """
@@ -31,10 +36,14 @@ class ReferenceCore(AbstractCore):
             return ErrorCode.EC_FAIL
 
         # Store query information
+        terms = terms.split()
+        match_type = MatchType(match_type)
         self.queries[query_id] = {
-            'terms': terms.split(),
-            'match_type': MatchType(match_type),
-            'match_dist': match_dist
+            'terms': terms,
+            'match_type': match_type,
+            'match_dist': match_dist,
+            # (term, match_type, match_dist) of the distinct terms, the rarest first. Sorted again when the selectivity changes.
+            'term_keys': self.term_selectivity.order(dict.fromkeys((term, match_type, match_dist) for term in terms))
         }
         return ErrorCode.EC_SUCCESS
     
@@ -53,12 +62,23 @@ class ReferenceCore(AbstractCore):
         """
         matched_queries = []
 
+        # the document is split once, every distinct word is compared once per term
+        doc_terms = set(content.split())
+        # (term, match_type, match_dist) -> whether a document word matches the term, shared by all queries
+        term_verdicts = {}
+
         for query_id, query in self.queries.items():
-            if self.matches_query(query, content):
+            if self.matches_query(query, doc_terms, term_verdicts):
                 matched_queries.append(query_id)
 
-        if matched_queries:
-            self.results.append((doc_id, matched_queries))
+        # only the terms that were compared count, the others were skipped after a missing term of their query
+        found_terms = [key for key, matching_word in term_verdicts.items() if matching_word]
+        if self.term_selectivity.add_document(found_terms, term_verdicts):
+            for query in self.queries.values():
+                query['term_keys'] = self.term_selectivity.order(query['term_keys'])
+
+        # every document has a result, also without matches (like in the other cores)
+        self.results.append((doc_id, matched_queries))
         return ErrorCode.EC_SUCCESS
 
     def get_next_avail_res(self):
@@ -68,76 +88,99 @@ class ReferenceCore(AbstractCore):
         if not self.results:
             return ErrorCode.EC_NO_AVAIL_RES, None, None, None
 
-        doc_id, matched_queries = self.results.pop(0)
+        doc_id, matched_queries = self.results.popleft()
         return ErrorCode.EC_SUCCESS, doc_id, len(matched_queries), matched_queries
     
-    def matches_query(self, query, content):
-        terms = query['terms']
+    def matches_query(self, query, doc_terms, term_verdicts):
         match_type = query['match_type']
         match_dist = query['match_dist']
         
-        # Split document content into terms
-        doc_terms = content.split()
-        
-        # Iterate over each query term
-        for term in terms:
-            matching_word = False  
-            
-            # Check each document term to find a match based on the match type
-            for doc_term in doc_terms:
-                if match_type == MatchType.EXACT:
-                    if term == doc_term:
-                        matching_word = True
-                        break
-                
-                elif match_type == MatchType.EDIT:
-                    dist = self.edit_distance(term, doc_term)
-                    if dist <= match_dist:
-                        matching_word = True
-                        break
-                
-                elif match_type == MatchType.HAMMING:
-                    dist = self.hamming_distance(term, doc_term)
-                    if dist <= match_dist:
-                        matching_word = True
-                        break
-
-            
+        # Iterate over each query term, the rarest first: the query fails at its first missing term
+        for key in query['term_keys']:
+            term = key[0]
+            matching_word = term_verdicts.get(key, None)
+
+            if matching_word is None:
+                matching_word = False
+
+                # Check each document term to find a match based on the match type
+                for doc_term in doc_terms:
+                    if match_type == MatchType.EXACT:
+                        if term == doc_term:
+                            matching_word = True
+                            break
+
+                    elif match_type == MatchType.EDIT:
+                        dist = self.edit_distance(term, doc_term, match_dist)
+                        if dist <= match_dist:
+                            matching_word = True
+                            break
+
+                    elif match_type == MatchType.HAMMING:
+                        dist = self.hamming_distance(term, doc_term, match_dist)
+                        if dist <= match_dist:
+                            matching_word = True
+                            break
+
+                term_verdicts[key] = matching_word
+
             if not matching_word:
                 return False
         
         return True
     
-    def edit_distance(self, s1, s2):
+    def edit_distance(self, s1, s2, max_dist=None):
+        """
+        Levenshtein distance of s1 and s2. With max_dist only the band of the DP table within max_dist of the
+        diagonal is filled and max_dist + 1 is returned as soon as the distance must exceed max_dist.
+        """
         len_s1, len_s2 = len(s1), len(s2)
+        if max_dist is None:
+            # the band covers the whole table
+            max_dist = max(len_s1, len_s2)
+        # every value above max_dist counts as max_dist + 1
+        too_far = max_dist + 1
+
+        if abs(len_s1 - len_s2) > max_dist:
+            return too_far
         if len_s1 == 0:
             return len_s2
         if len_s2 == 0:
             return len_s1
 
-        # Create a full 2D DP table 
-        dp_table = [[0] * (len_s2 + 1) for _ in range(len_s1 + 1)]
-
-        # Initialize the base cases
-        for i in range(len_s1 + 1):
-            dp_table[i][0] = i
-        for j in range(len_s2 + 1):
-            dp_table[0][j] = j
+        # Only two rows of the DP table, the cells outside of the band stay too_far
+        previous_row = [j if j <= max_dist else too_far for j in range(len_s2 + 1)]
 
         # Fill the DP table
         for i in range(1, len_s1 + 1):
-            for j in range(1, len_s2 + 1):
-                insert_cost = dp_table[i - 1][j] + 1
-                delete_cost = dp_table[i][j - 1] + 1
-                replace_cost = dp_table[i - 1][j - 1]
+            current_row = [too_far] * (len_s2 + 1)
+            if i <= max_dist:
+                current_row[0] = i
+
+            for j in range(max(1, i - max_dist), min(len_s2, i + max_dist) + 1):
+                insert_cost = previous_row[j] + 1
+                delete_cost = current_row[j - 1] + 1
+                replace_cost = previous_row[j - 1]
                 if s1[i - 1] != s2[j - 1]:
                     replace_cost += 1
-                dp_table[i][j] = min(insert_cost, delete_cost, replace_cost)
+                current_row[j] = min(insert_cost, delete_cost, replace_cost, too_far)
+
+            # the distance never gets smaller than the minimum of a row
+            if min(current_row) > max_dist:
+                return too_far
+            previous_row = current_row
 
-        return dp_table[len_s1][len_s2]
+        return previous_row[len_s2]
     
-    def hamming_distance(self, s1, s2):
+    def hamming_distance(self, s1, s2, max_dist=None):
         if len(s1) != len(s2):
             return 0x7FFFFFFF  
 
-        return sum(1 for x, y in zip(s1, s2) if x != y)
\ No newline at end of file
+        dist = 0
+        for x, y in zip(s1, s2):
+            if x != y:
+                dist += 1
+                # stops counting once the distance exceeds max_dist
+                if max_dist is not None and dist > max_dist:
+                    break
+        return dist
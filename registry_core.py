@@ -0,0 +1,159 @@
+# Base of the cores that keep the distinct query terms (see term_registry.py) in their own matching structure
+# instead of the deletion index, e.g. rapidfuzz_core.py and bk_tree_core.py.
+# The queries, the term registry, the EXACT terms (a dict lookup) and the results are handled here. The EDIT and
+# HAMMING terms are grouped by (match_type, match_dist), the HAMMING terms additionally by length: the hamming
+# distance is only defined on words of the same length. A core adds the terms of a group to its structure and
+# returns the matched term ids of the document words.
+from abc import abstractmethod
+from collections import deque
+
+from abstract_core import AbstractCore
+from core_utils import MatchType, ErrorCode
+from term_registry import TermRegistry
+
+class RegistryCore(AbstractCore):
+    def __init__(self):
+        self.queries = {}
+        self.results = deque()
+        self.term_registry = TermRegistry()
+        # term -> term ids of the EXACT terms, the match_dist of EXACT queries does not matter
+        self.exact_terms = {}
+
+    def initialize_index(self):
+        """
+        Clears all queries and results to initialize the indexing system.
+        """
+        self.queries.clear()
+        self.results.clear()
+        self.term_registry.clear()
+        self.exact_terms.clear()
+        self._clear_terms()
+
+    def destroy_index(self):
+        """
+        Clears the index, effectively the same as re-initializing.
+        """
+        self.initialize_index()
+
+    def _get_group(self, term, match_type, match_dist):
+        # (match_type, match_dist, term length or None), only the HAMMING terms are split by length
+        return (match_type, match_dist, len(term) if match_type == MatchType.HAMMING else None)
+
+    def start_query(self, query_id, terms, match_type, match_dist):
+        """
+        Initializes a new query with the specified id, terms, match type, and distance.
+        """
+        if query_id in self.queries:
+            return ErrorCode.EC_FAIL
+
+        terms = terms.split()
+        match_type = MatchType(match_type)
+        self.queries[query_id] = {
+            'terms': terms,
+            'match_type': match_type,
+            'match_dist': match_dist
+        }
+
+        for term_id, term in self.term_registry.add_query(query_id, terms, match_type, match_dist):
+            if match_type == MatchType.EXACT:
+                self.exact_terms.setdefault(term, []).append(term_id)
+            else:
+                self._add_term(self._get_group(term, match_type, match_dist), term_id, term)
+
+        return ErrorCode.EC_SUCCESS
+
+    def end_query(self, query_id):
+        """
+        Ends a query by removing it from the active query list.
+        """
+        if query_id not in self.queries:
+            return ErrorCode.EC_FAIL
+
+        query = self.queries.pop(query_id)
+        match_type, match_dist = query['match_type'], query['match_dist']
+
+        for term_id, term in self.term_registry.remove_query(query_id):
+            if match_type == MatchType.EXACT:
+                term_ids = self.exact_terms[term]
+                term_ids.remove(term_id)
+                if not term_ids:
+                    del self.exact_terms[term]
+            else:
+                self._remove_term(self._get_group(term, match_type, match_dist), term_id, term)
+
+        return ErrorCode.EC_SUCCESS
+
+    def match_document(self, doc_id, content):
+        """
+        Matches a document against all active queries and stores the result if matched.
+        """
+        return self.match_documents([(doc_id, content)])
+
+    def match_documents(self, batch):
+        """
+        Matches a batch of (doc_id, content) documents. Every distinct word of the batch is looked up once.
+        """
+        batch_words = [set(content.split()) for _, content in batch]
+        words_matches = self._find_words_matches(list(set().union(*batch_words)))
+        exact_terms = self.exact_terms
+
+        for (doc_id, _), doc_words in zip(batch, batch_words):
+            found_term_ids = set()
+            for word in doc_words:
+                found_term_ids.update(exact_terms.get(word, ()))
+                found_term_ids.update(words_matches.get(word, ()))
+            self.results.append((doc_id, self.term_registry.get_query_matches(found_term_ids)))
+
+        return ErrorCode.EC_SUCCESS
+
+    def _find_words_matches(self, doc_words):
+        """
+        Returns the ids of the EDIT and HAMMING terms that match the distinct document words: word -> [term_id, ...].
+        By default every word is looked up on its own with _find_word_matches(word) of the core, the cores that
+        match all words at once (e.g. rapidfuzz_core.py) override this method instead.
+        """
+        return {word: self._find_word_matches(word) for word in doc_words}
+
+    @abstractmethod
+    def _add_term(self, group, term_id, term):
+        """
+        Adds an EDIT or HAMMING term of a group (see _get_group) to the structure of the core.
+        """
+        pass
+
+    @abstractmethod
+    def _remove_term(self, group, term_id, term):
+        """
+        Removes an EDIT or HAMMING term of a group from the structure of the core.
+        """
+        pass
+
+    @abstractmethod
+    def _clear_terms(self):
+        """
+        Removes all terms from the structure of the core.
+        """
+        pass
+
+    def get_next_avail_res(self):
+        """
+        Retrieves the next available result for delivery.
+        """
+        if not self.results:
+            return ErrorCode.EC_NO_AVAIL_RES, None, None, None
+
+        doc_id, matched_queries = self.results.popleft()
+        return ErrorCode.EC_SUCCESS, doc_id, len(matched_queries), matched_queries
+
+    def get_stats(self):
+        """
+        Returns the size of the term registry, of the EXACT terms and of the structure of the core.
+        """
+        return {
+            'queries': self.term_registry.stats(),
+            'exact_terms': len(self.exact_terms),
+            **self._get_term_stats(),
+        }
+
+    def _get_term_stats(self):
+        return {}
@@ -0,0 +1,165 @@
+# Query sharded core: the active queries are hash-partitioned over num_shards worker processes.
+# Every shard is a MaxThroughputCore (in process) with the index of its own queries only, so the memory per process
+# shrinks with the number of shards. Every document is broadcast to all shards, the matched query ids of the
+# shards are merged into one result per document.
+from collections import deque
+from multiprocessing import Process, Pipe
+import pickle
+
+from abstract_core import AbstractCore
+from core_utils import ErrorCode
+from max_throughput_core import MaxThroughputCore
+
+def _shard_loop(conn, cache_size, index_backend):
+    core = MaxThroughputCore(num_workers=0, cache_size=cache_size, index_backend=index_backend)
+    core.initialize_index()
+
+    while True:
+        command, payload = conn.recv()
+
+        match command:
+            case "start_query":
+                core.start_query(*payload)
+            case "end_query":
+                core.end_query(payload)
+            case "match":
+                # the results are in the order of the batch, only the query ids are sent back
+                core.match_documents(payload)
+                conn.send([matched_queries for _, _, matched_queries in core.get_available_results()])
+            case "get_stats":
+                conn.send(core.get_stats())
+            case "reset_stats":
+                core.reset_stats()
+            case "stop":
+                break
+            case _:
+                raise Exception(f"Unknown shard command '{command}'.")
+
+    core.destroy_index()
+    conn.close()
+
+class ShardedCore(AbstractCore):
+    def __init__(self, num_shards=4, cache_size=100_000, index_backend="hash"):
+        self.num_shards = num_shards
+        self.cache_size = cache_size
+        self.index_backend = index_backend
+        self.query_shards = {}  # query_id -> shard
+        self.results = deque()
+        self.connections = []
+        self.processes = []
+
+    def initialize_index(self):
+        """
+        Clears all queries and results and starts the shards.
+        """
+        self._stop_shards()
+        self.query_shards.clear()
+        self.results.clear()
+
+        for _ in range(self.num_shards):
+            parent_conn, child_conn = Pipe()
+            process = Process(target=_shard_loop, args=(child_conn, self.cache_size, self.index_backend), daemon=True)
+            process.start()
+            child_conn.close()
+
+            self.connections.append(parent_conn)
+            self.processes.append(process)
+
+    def destroy_index(self):
+        """
+        Clears all queries and results and shuts the shards down.
+        """
+        self._stop_shards()
+        self.query_shards.clear()
+        self.results.clear()
+
+    def _stop_shards(self):
+        for conn in self.connections:
+            try:
+                conn.send(("stop", None))
+            except (BrokenPipeError, OSError):
+                pass
+
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+        for conn in self.connections:
+            conn.close()
+
+        self.connections = []
+        self.processes = []
+
+    def _get_shard(self, query_id):
+        return hash(query_id) % self.num_shards
+
+    def start_query(self, query_id, terms, match_type, match_dist):
+        """
+        Starts the query on its shard.
+        """
+        if query_id in self.query_shards:
+            return ErrorCode.EC_FAIL
+
+        shard = self.query_shards[query_id] = self._get_shard(query_id)
+        self.connections[shard].send(("start_query", (query_id, terms, int(getattr(match_type, "value", match_type)), match_dist)))
+        return ErrorCode.EC_SUCCESS
+
+    def end_query(self, query_id):
+        """
+        Ends the query on its shard.
+        """
+        shard = self.query_shards.pop(query_id, None)
+        if shard is None:
+            return ErrorCode.EC_FAIL
+
+        self.connections[shard].send(("end_query", query_id))
+        return ErrorCode.EC_SUCCESS
+
+    def match_document(self, doc_id, content):
+        """
+        Matches a document against the queries of all shards.
+        """
+        return self.match_documents([(doc_id, content)])
+
+    def match_documents(self, batch):
+        """
+        Broadcasts a batch of (doc_id, content) documents to all shards and merges their results.
+        """
+        # the batch is pickled once for all shards
+        message = pickle.dumps(("match", batch))
+        for conn in self.connections:
+            conn.send_bytes(message)
+
+        batch_matches = [set() for _ in batch]
+        for conn in self.connections:
+            for matched_queries, shard_matches in zip(batch_matches, conn.recv()):
+                matched_queries.update(shard_matches)
+
+        self.results.extend((doc_id, matched_queries) for (doc_id, _), matched_queries in zip(batch, batch_matches))
+        return ErrorCode.EC_SUCCESS
+
+    def get_next_avail_res(self):
+        """
+        Retrieves the next available result for delivery.
+        """
+        if not self.results:
+            return ErrorCode.EC_NO_AVAIL_RES, None, None, None
+
+        doc_id, matched_queries = self.results.popleft()
+        return ErrorCode.EC_SUCCESS, doc_id, len(matched_queries), matched_queries
+
+    def get_stats(self):
+        """
+        Returns the stats of every shard (MaxThroughputCore.get_stats).
+        """
+        for conn in self.connections:
+            conn.send(("get_stats", None))
+        return {'shards': [conn.recv() for conn in self.connections]}
+
+    def reset_stats(self):
+        """
+        Resets the counters of every shard, e.g. the hits of its cache.
+        """
+        for conn in self.connections:
+            conn.send(("reset_stats", None))
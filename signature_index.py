@@ -0,0 +1,123 @@
+# Signature index for long terms (pigeonhole filter), used by the length partitioned index above its signature threshold.
+# The deletion index stores sum C(n, k) for k <= d variants of a term of length n, for a 20 letter term at
+# distance 3 about 1,500, and a document word of that length generates as many lookups again.
+# Here a term with match_dist d is split into d + 1 segments. d edits can change at most d of them, so a matching
+# document word contains at least one segment unchanged: for HAMMING (and EXACT) at the same position, for EDIT
+# shifted by at most d positions. Every segment is a key of the index, the candidates that share a segment with
+# the document word are then verified exactly.
+import time
+
+from core_utils import MatchType
+from verification_utils import bounded_levenshtein_distance
+
+def get_segment_bounds(term_length, num_segments):
+    """
+    Returns the (start, end) of the segments of a term, they differ in length by at most 1.
+    """
+    return [(i * term_length // num_segments, (i + 1) * term_length // num_segments) for i in range(num_segments)]
+
+def verify_candidate(word, term, match_type, match_dist):
+    match MatchType(match_type):
+        case MatchType.EXACT:
+            return word == term
+        case MatchType.HAMMING:
+            if len(word) != len(term):
+                return False
+            mismatches = 0
+            for word_char, term_char in zip(word, term):
+                if word_char != term_char:
+                    mismatches += 1
+                    if mismatches > match_dist:
+                        return False
+            return True
+        case MatchType.EDIT:
+            return bounded_levenshtein_distance(term, word, match_dist) <= match_dist
+
+class SignatureIndex:
+    def __init__(self):
+        # (term length, number of segments, shifted, segment number, segment) -> {term_id: (term, match_type, match_dist)}
+        # shifted: the segments of EDIT terms can be found at shifted positions of the document word
+        self.segments = {}
+        # (term length, number of segments, shifted) -> number of terms, the layouts that are probed
+        self.layouts = {}
+        self.num_terms = 0
+
+    def __len__(self):
+        return self.num_terms
+
+    def _get_layout(self, term, match_type, match_dist):
+        # EXACT terms never change, they are one segment
+        num_segments = 1 if match_type == MatchType.EXACT.value else match_dist + 1
+        return (len(term), num_segments, match_type == MatchType.EDIT.value)
+
+    def insert(self, term_id, match_type, match_dist, term):
+        layout = self._get_layout(term, match_type, match_dist)
+        term_length, num_segments, shifted = layout
+        for segment_number, (start, end) in enumerate(get_segment_bounds(term_length, num_segments)):
+            key = (term_length, num_segments, shifted, segment_number, term[start:end])
+            self.segments.setdefault(key, {})[term_id] = (term, match_type, match_dist)
+
+        self.layouts[layout] = self.layouts.get(layout, 0) + 1
+        self.num_terms += 1
+
+    def delete(self, term_id, match_type, match_dist, term):
+        layout = self._get_layout(term, match_type, match_dist)
+        term_length, num_segments, shifted = layout
+        for segment_number, (start, end) in enumerate(get_segment_bounds(term_length, num_segments)):
+            key = (term_length, num_segments, shifted, segment_number, term[start:end])
+            entries = self.segments[key]
+            del entries[term_id]
+            if not entries:
+                del self.segments[key]
+
+        self.layouts[layout] -= 1
+        if not self.layouts[layout]:
+            del self.layouts[layout]
+        self.num_terms -= 1
+
+    def find_word_matches(self, word, stats=None):
+        """
+        Returns all (term_id, term) hits of a document word.
+        """
+        word_length = len(word)
+        segments = self.segments
+        candidates = {}
+        num_probes = 0
+
+        for term_length, num_segments, shifted in self.layouts:
+            # an edit distance of num_segments - 1 allows as many inserted or deleted characters
+            max_shift = num_segments - 1 if shifted else 0
+            if abs(term_length - word_length) > max_shift:
+                continue
+
+            for segment_number, (start, end) in enumerate(get_segment_bounds(term_length, num_segments)):
+                segment_length = end - start
+                for position in range(max(start - max_shift, 0), min(start + max_shift, word_length - segment_length) + 1):
+                    num_probes += 1
+                    entries = segments.get((term_length, num_segments, shifted, segment_number, word[position:position + segment_length]), None)
+                    if entries is not None:
+                        candidates.update(entries)
+
+        verify_time = time.perf_counter()
+        word_matches = {(term_id, term) for term_id, (term, match_type, match_dist) in candidates.items()
+                        if verify_candidate(word, term, match_type, match_dist)}
+
+        if stats is not None:
+            stats.phase_times['verify'] += time.perf_counter() - verify_time
+            stats.counters['probes'] += num_probes
+            stats.counters['postings_scanned'] += len(candidates)
+            for _, match_type, _ in candidates.values():
+                stats.verifications[match_type] += 1
+        return word_matches
+
+    def clear(self):
+        self.segments.clear()
+        self.layouts.clear()
+        self.num_terms = 0
+
+    def stats(self):
+        return {
+            'terms': self.num_terms,
+            'keys': len(self.segments),
+            'layouts': dict(self.layouts),
+        }
@@ -0,0 +1,252 @@
+# Snapshots of the max throughput core: the query table, the term registry and the length partitioned index.
+# A restarted core loads the snapshot instead of replaying every start_query, which regenerates all deletions.
+#
+# Like the traces (see trace_utils.py) a snapshot is a columnar file with 8 byte aligned columns that are read
+# through mmap. The queries and terms are decoded on load, the partitions of the index are only decoded when
+# they are first used (see LengthPartitionedIndex.load_snapshot).
+# Strings (words and index keys) are stored as one blob separated by spaces, words never contain whitespace.
+from array import array
+import mmap
+import struct
+import sys
+
+from index_backends import create_index
+from posting_store import PostingStore, create_posting_rows, MASK_BITS
+
+SNAPSHOT_MAGIC = b"DIASNAP\0"
+SNAPSHOT_VERSION = 1
+
+# magic, version, byte order, number of queries, number of terms, next term id, number of partitions
+SNAPSHOT_HEADER = struct.Struct("<8sIIQQQQ")
+
+# vocabulary, query table (query_id, match_type, match_dist, words), terms (term_id, word, match_type, match_dist),
+# lengths of the partitions
+GLOBAL_COLUMNS = 12
+# words, postings (query_id, query_type, query_dist, mask, word_id), rows per term, keys and their row ranges.
+# The masks of terms longer than 64 characters take several 64 bit words (see _mask_words).
+PARTITION_COLUMNS = 12
+
+def _padding(offset):
+    return -offset % 8
+
+def _join_strings(strings):
+    return " ".join(strings).encode("utf-8")
+
+def _split_strings(blob, num_strings):
+    if num_strings == 0:
+        return []
+    return bytes(blob).decode("utf-8").split(" ")
+
+def _mask_words(term_length):
+    # the masks of a partition with terms longer than 64 characters are split into several 64 bit words
+    return max((term_length + MASK_BITS - 1) // MASK_BITS, 1)
+
+def _split_masks(masks, num_words):
+    if num_words == 1:
+        return array('Q', masks)
+    low_bits = (1 << MASK_BITS) - 1
+    return array('Q', [mask >> (MASK_BITS * i) & low_bits for mask in masks for i in range(num_words)])
+
+def _join_masks(mask_words, num_words):
+    return [sum(mask_words[row + i] << (MASK_BITS * i) for i in range(num_words)) for row in range(0, len(mask_words), num_words)]
+
+def _get_partition_columns(partition, term_length, vocabulary):
+    """
+    Returns the columns of a partition. Only the live postings are written. They are renumbered in the order
+    of the index keys, so that every key points to a contiguous range of rows.
+    """
+    postings = partition.postings
+    keys = []
+    key_row_offsets = array('Q', [0])
+    new_rows = {}
+    for key, rows in partition.items():
+        for row in rows:
+            if not postings.is_dead(row):
+                new_rows[row] = len(new_rows)
+        if len(new_rows) > key_row_offsets[-1]:
+            keys.append(key)
+            key_row_offsets.append(len(new_rows))
+
+    term_ids = array('I', sorted(postings.query_rows))
+    term_row_offsets = array('Q', [0])
+    term_rows = array('I')
+    for term_id in term_ids:
+        term_rows.extend(new_rows[row] for row in postings.query_rows[term_id])
+        term_row_offsets.append(len(term_rows))
+
+    old_rows = list(new_rows)
+    words = sorted({postings.word_ids[row] for row in old_rows})
+    word_ids = {word_id: i for i, word_id in enumerate(words)}
+
+    return [
+        array('I', [vocabulary.setdefault(postings.words[word_id], len(vocabulary)) for word_id in words]),
+        array('I', [postings.query_ids[row] for row in old_rows]),
+        array('B', [postings.query_types[row] for row in old_rows]),
+        array('B', [postings.query_dists[row] for row in old_rows]),
+        _split_masks([postings.masks[row] for row in old_rows], _mask_words(term_length)),
+        array('I', [word_ids[postings.word_ids[row]] for row in old_rows]),
+        term_ids,
+        term_row_offsets,
+        term_rows,
+        array('Q', [len(keys)]),
+        _join_strings(keys),
+        key_row_offsets,
+    ]
+
+def write_snapshot(snapshot_fp, queries, term_registry, index):
+    """
+    Writes the queries (query_id -> {'terms', 'match_type', 'match_dist'}), the term registry and the
+    length partitioned index into a snapshot file.
+    """
+    vocabulary = {}
+
+    query_ids = array('I', queries)
+    query_types = array('B', [queries[query_id]['match_type'].value for query_id in query_ids])
+    query_dists = array('B', [queries[query_id]['match_dist'] for query_id in query_ids])
+    query_word_offsets = array('Q', [0])
+    query_words = array('I')
+    for query_id in query_ids:
+        query_words.extend(vocabulary.setdefault(word, len(vocabulary)) for word in queries[query_id]['terms'])
+        query_word_offsets.append(len(query_words))
+
+    term_ids = array('I', term_registry.terms)
+    term_words = array('I')
+    term_types = array('B')
+    term_dists = array('B')
+    for term_id in term_ids:
+        term, match_type, match_dist = term_registry.terms[term_id]
+        term_words.append(vocabulary.setdefault(term, len(vocabulary)))
+        term_types.append(match_type)
+        term_dists.append(match_dist)
+
+    partition_lengths = sorted(index.partitions)
+    partition_columns = [_get_partition_columns(index.get_partition(term_length), term_length, vocabulary) for term_length in partition_lengths]
+
+    # the vocabulary is complete once all partitions are collected
+    columns = [array('Q', [len(vocabulary)]), _join_strings(vocabulary),
+               query_ids, query_types, query_dists, query_word_offsets, query_words,
+               term_ids, term_words, term_types, term_dists,
+               array('I', partition_lengths)]
+    for partition_column in partition_columns:
+        columns.extend(partition_column)
+
+    byte_order = 0 if sys.byteorder == "little" else 1
+    header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, byte_order, len(query_ids), len(term_ids),
+                                  term_registry.next_term_id, len(partition_lengths))
+    # the reader needs the length of every column
+    column_lengths = array('Q', [len(column) for column in columns])
+
+    with open(snapshot_fp, "wb") as snapshot_file:
+        offset = snapshot_file.write(header)
+        for column in [column_lengths] + columns:
+            offset += snapshot_file.write(b"\0" * _padding(offset))
+            offset += snapshot_file.write(column)
+
+class Snapshot:
+    """
+    Read only view on a memory-mapped snapshot file. The partitions are decoded on demand with read_partition.
+    """
+    def __init__(self, snapshot_fp):
+        with open(snapshot_fp, "rb") as snapshot_file:
+            self.mmap = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buffer = memoryview(self.mmap)
+
+        magic, version, byte_order, num_queries, num_terms, next_term_id, num_partitions = SNAPSHOT_HEADER.unpack_from(self.buffer)
+        error = None
+        if magic != SNAPSHOT_MAGIC:
+            error = "Not a snapshot file."
+        elif version != SNAPSHOT_VERSION:
+            error = f"Unsupported snapshot version {version}, expected {SNAPSHOT_VERSION}."
+        elif byte_order != (0 if sys.byteorder == "little" else 1):
+            error = "The snapshot was written on a machine with a different byte order."
+        if error is not None:
+            self.buffer.release()
+            self.mmap.close()
+            raise Exception(error)
+
+        self.next_term_id = next_term_id
+        global_typecodes = ['Q', 'B', 'I', 'B', 'B', 'Q', 'I', 'I', 'I', 'B', 'B', 'I']
+        partition_typecodes = ['I', 'I', 'B', 'B', 'Q', 'I', 'I', 'Q', 'I', 'Q', 'B', 'Q']
+        typecodes = global_typecodes + partition_typecodes * num_partitions
+
+        offset = SNAPSHOT_HEADER.size
+        num_columns = len(typecodes)
+        offset += _padding(offset)
+        column_lengths = self.buffer[offset:offset + num_columns * 8].cast('Q')
+        offset += num_columns * 8
+
+        self.columns = []
+        for typecode, length in zip(typecodes, column_lengths):
+            offset += _padding(offset)
+            size = length * array(typecode).itemsize
+            self.columns.append(self.buffer[offset:offset + size].cast(typecode))
+            offset += size
+        column_lengths.release()
+
+        self.vocabulary = _split_strings(self.columns[1], self.columns[0][0])
+        self.partition_lengths = list(self.columns[GLOBAL_COLUMNS - 1])
+        self.partition_columns = {term_length: self.columns[GLOBAL_COLUMNS + i * PARTITION_COLUMNS:GLOBAL_COLUMNS + (i + 1) * PARTITION_COLUMNS]
+                                  for i, term_length in enumerate(self.partition_lengths)}
+
+    def read_queries(self):
+        """
+        Returns the query table: query_id -> (terms, match_type, match_dist).
+        """
+        query_ids, query_types, query_dists, query_word_offsets, query_words = self.columns[2:7]
+        vocabulary = self.vocabulary
+        return {query_ids[i]: ([vocabulary[word] for word in query_words[query_word_offsets[i]:query_word_offsets[i + 1]]], query_types[i], query_dists[i])
+                for i in range(len(query_ids))}
+
+    def read_terms(self):
+        """
+        Returns the terms of the registry: term_id -> (term, match_type, match_dist).
+        """
+        term_ids, term_words, term_types, term_dists = self.columns[7:11]
+        vocabulary = self.vocabulary
+        return {term_ids[i]: (vocabulary[term_words[i]], term_types[i], term_dists[i]) for i in range(len(term_ids))}
+
+    def read_index_terms(self, terms):
+        """
+        Returns the terms (see read_terms) that have postings in the index. The others are e.g. verified by the
+        hamming verifier of the core that wrote the snapshot.
+        """
+        index_term_ids = set()
+        for partition_columns in self.partition_columns.values():
+            index_term_ids.update(partition_columns[6])
+        return {term_id: term for term_id, term in terms.items() if term_id in index_term_ids}
+
+    def read_partition(self, term_length, backend="hash"):
+        """
+        Decodes the deletion index of a term length. The columns are copied out of the file.
+        """
+        (words, query_ids, query_types, query_dists, masks, word_ids,
+         term_ids, term_row_offsets, term_rows, num_keys, key_bytes, key_row_offsets) = self.partition_columns[term_length]
+
+        postings = PostingStore()
+        for column, values in ((postings.query_ids, query_ids), (postings.query_types, query_types), (postings.query_dists, query_dists),
+                               (postings.word_ids, word_ids)):
+            column.frombytes(values.cast('B'))
+        num_mask_words = _mask_words(term_length)
+        if num_mask_words == 1:
+            postings.masks.frombytes(masks.cast('B'))
+        else:
+            postings.masks = _join_masks(masks, num_mask_words)
+        postings.load_words([self.vocabulary[word] for word in words])
+        term_rows = create_posting_rows(term_rows)
+        postings.query_rows = {term_ids[i]: term_rows[term_row_offsets[i]:term_row_offsets[i + 1]] for i in range(len(term_ids))}
+
+        # the keys point to ranges of rows, they are only turned into arrays once they change (see input_query_in_trie)
+        keys = _split_strings(key_bytes, num_keys[0])
+        key_row_offsets = key_row_offsets.tolist()
+        index_rows = map(range, key_row_offsets, key_row_offsets[1:])
+
+        index = create_index(backend)
+        index.postings = postings
+        index.update(zip(keys, index_rows))
+        return index
+
+    def close(self):
+        for column in self.columns:
+            column.release()
+        self.buffer.release()
+        self.mmap.close()
@@ -0,0 +1,134 @@
+# Reference counted registry of the distinct query terms.
+# Many queries share the same (term, match_type, match_dist) triple. Every triple gets a term id and is
+# indexed only once, the matches of a term are then fanned out to all queries that use it.
+# The terms of a query are ordered by their selectivity (see term_selectivity.py), every query is anchored at its
+# rarest term. A query is only checked if its anchor was found, all queries of a missing anchor are skipped at once.
+from term_selectivity import TermSelectivity
+
+class TermRegistry:
+    def __init__(self):
+        self.term_ids = {}  # (term, match_type, match_dist) -> term_id
+        self.terms = {}  # term_id -> (term, match_type, match_dist)
+        self.term_queries = {}  # term_id -> ids of the queries that use the term
+        self.query_terms = {}  # query_id -> distinct term ids of the query, the rarest first
+        self.anchor_queries = {}  # term_id -> ids of the queries whose rarest term it is
+        self.selectivity = TermSelectivity()
+        self.next_term_id = 0
+
+    def add_query(self, query_id, terms, match_type, match_dist):
+        """
+        Registers the terms of a query. Returns the (term_id, term) pairs that are new and have to be indexed.
+        """
+        match_type = int(getattr(match_type, "value", match_type))
+        new_terms = []
+        query_term_ids = []
+
+        for term in terms:
+            key = (term, match_type, match_dist)
+            term_id = self.term_ids.get(key, None)
+
+            if term_id is None:
+                term_id = self.next_term_id
+                self.next_term_id += 1
+                self.term_ids[key] = term_id
+                self.terms[term_id] = key
+                self.term_queries[term_id] = set()
+                new_terms.append((term_id, term))
+
+            if term_id not in query_term_ids:
+                query_term_ids.append(term_id)
+            self.term_queries[term_id].add(query_id)
+
+        self._set_query_terms(query_id, query_term_ids)
+        return new_terms
+
+    def _set_query_terms(self, query_id, query_term_ids):
+        query_term_ids = tuple(self.selectivity.order(query_term_ids))
+        self.query_terms[query_id] = query_term_ids
+        if query_term_ids:
+            self.anchor_queries.setdefault(query_term_ids[0], set()).add(query_id)
+
+    def _remove_anchor(self, query_id, anchor_term_id):
+        queries = self.anchor_queries[anchor_term_id]
+        queries.discard(query_id)
+        if not queries:
+            del self.anchor_queries[anchor_term_id]
+
+    def _reorder_query_terms(self):
+        # the selectivity changed, every query is anchored at its rarest term again
+        for query_id, query_term_ids in list(self.query_terms.items()):
+            if query_term_ids:
+                self._remove_anchor(query_id, query_term_ids[0])
+                self._set_query_terms(query_id, query_term_ids)
+
+    def restore(self, terms, queries, next_term_id):
+        """
+        Restores the registry from the terms (term_id -> (term, match_type, match_dist)) and the
+        queries (query_id -> (terms, match_type, match_dist)) of a snapshot.
+        """
+        self.clear()
+        self.terms = dict(terms)
+        self.term_ids = {key: term_id for term_id, key in self.terms.items()}
+        self.term_queries = {term_id: set() for term_id in self.terms}
+        self.next_term_id = next_term_id
+
+        for query_id, (query_terms, match_type, match_dist) in queries.items():
+            query_term_ids = tuple(dict.fromkeys(self.term_ids[(term, match_type, match_dist)] for term in query_terms))
+            for term_id in query_term_ids:
+                self.term_queries[term_id].add(query_id)
+            self._set_query_terms(query_id, query_term_ids)
+
+    def remove_query(self, query_id):
+        """
+        Unregisters the terms of a query. Returns the (term_id, term) pairs that are not used anymore and
+        have to be removed from the index.
+        """
+        removed_terms = []
+
+        query_term_ids = self.query_terms.pop(query_id)
+        if query_term_ids:
+            self._remove_anchor(query_id, query_term_ids[0])
+
+        for term_id in query_term_ids:
+            queries = self.term_queries[term_id]
+            queries.discard(query_id)
+
+            if not queries:
+                del self.term_queries[term_id]
+                key = self.terms.pop(term_id)
+                del self.term_ids[key]
+                self.selectivity.remove_term(term_id)
+                removed_terms.append((term_id, key[0]))
+
+        return removed_terms
+
+    def get_query_matches(self, found_term_ids):
+        """
+        Returns the ids of the queries of which all terms were found in a document (found_term_ids is a set).
+        Only the queries that are anchored at a found term are touched, every other query misses its rarest term.
+        The found terms are counted in the selectivity.
+        """
+        query_matches = set()
+        query_terms = self.query_terms
+
+        for term_id in found_term_ids:
+            for query_id in self.anchor_queries.get(term_id, ()):
+                if found_term_ids.issuperset(query_terms[query_id]):
+                    query_matches.add(query_id)
+
+        if self.selectivity.add_document(found_term_ids):
+            self._reorder_query_terms()
+        return query_matches
+
+    def clear(self):
+        self.__init__()
+
+    def stats(self):
+        num_query_terms = sum(len(term_ids) for term_ids in self.query_terms.values())
+        return {
+            'queries': len(self.query_terms),
+            'query_terms': num_query_terms,
+            'distinct_terms': len(self.terms),
+            'duplication_ratio': num_query_terms / len(self.terms) if self.terms else 0.0,
+            'anchor_terms': len(self.anchor_queries),
+        }
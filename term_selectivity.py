@@ -0,0 +1,67 @@
+# Online selectivity of the query terms: how many of the recent documents a term was found in.
+# The hits are counted per document, every window documents all counts are halved, so that the rates follow the
+# documents that are currently streamed in. Terms that were not seen yet count as rare.
+# Used to evaluate the rarest term of a query first, see term_registry.py and reference_core.py.
+
+# number of documents after which the counts are halved
+SELECTIVITY_WINDOW = 1000
+
+class TermSelectivity:
+    def __init__(self, window=SELECTIVITY_WINDOW):
+        self.window = window
+        self.term_hits = {}  # term -> decayed number of documents the term was found in
+        # term -> decayed number of documents the term was checked against, only for the callers that skip terms.
+        # The other terms are checked against every document.
+        self.term_evaluations = {}
+        self.num_documents = 0  # decayed number of documents
+        self.window_documents = 0  # documents since the counts were last halved
+        self.halved = False  # whether the first window is full
+
+    def add_document(self, found_terms, evaluated_terms=None):
+        """
+        Counts the terms that were found in a document. evaluated_terms are the terms that were checked at all, if a
+        caller skips terms (e.g. the rest of a query once a term is missing), None if every term was checked.
+        Returns True if the order of the terms should be refreshed: after 1, 2, 4, ... documents while the first
+        window fills up and whenever the counts are halved.
+        """
+        term_hits = self.term_hits
+        for term in found_terms:
+            term_hits[term] = term_hits.get(term, 0) + 1
+        if evaluated_terms is not None:
+            term_evaluations = self.term_evaluations
+            for term in evaluated_terms:
+                term_evaluations[term] = term_evaluations.get(term, 0) + 1
+
+        self.num_documents += 1
+        self.window_documents += 1
+        if self.window_documents < self.window:
+            # the first statistics change the order the most
+            return not self.halved and self.window_documents & (self.window_documents - 1) == 0
+
+        self.num_documents //= 2
+        self.window_documents = 0
+        self.halved = True
+        # the terms that were not found (or checked) for a while are dropped
+        self.term_hits = {term: hits // 2 for term, hits in term_hits.items() if hits > 1}
+        self.term_evaluations = {term: evaluations // 2 for term, evaluations in self.term_evaluations.items() if evaluations > 1}
+        return True
+
+    def hit_rate(self, term):
+        return self.term_hits.get(term, 0) / max(self.term_evaluations.get(term, self.num_documents), 1)
+
+    def order(self, terms):
+        """
+        Returns the terms sorted from the rarest to the most frequent one.
+        """
+        return sorted(terms, key=self.hit_rate)
+
+    def remove_term(self, term):
+        self.term_hits.pop(term, None)
+        self.term_evaluations.pop(term, None)
+
+    def clear(self):
+        self.term_hits.clear()
+        self.term_evaluations.clear()
+        self.num_documents = 0
+        self.window_documents = 0
+        self.halved = False
@@ -1,12 +1,37 @@
 import unittest
-from pygtrie import CharTrie
-from trie_utils import input_query_in_trie, get_deletions_for_document, find_document_matches
+from trie_utils import input_query_in_trie, delete_query_from_trie, get_deletions_for_document, find_document_matches, find_word_matches
 from math import comb
 from trie_utils import MatchType
+from core_utils import ErrorCode
+from test_core import run_test_driver
+from max_throughput_core import MaxThroughputCore
+from dask_core import DaskCore
+from sharded_core import ShardedCore
+from rapidfuzz_core import RapidFuzzCore
+from bk_tree_core import BKTreeCore
+from bk_tree import BKTree
+from match_cache import WordMatchCache
+from index_backends import create_index
+from verification_utils import bounded_levenshtein_distance
+from reference_core import ReferenceCore
+from term_registry import TermRegistry
+from term_selectivity import TermSelectivity
+from partitioned_index import LengthPartitionedIndex
+from trace_utils import compile_trace, open_trace, run_trace_driver
+from snapshot_utils import Snapshot
+from workload_generator import generate_workload
+from hamming_verifier import HammingVerifier, HIGH_BITS, sum_byte_high_bits
+from deletion_utils import get_deletion, get_word_deletions, get_batch_deletions
+import numpy as np
+import struct
+import os
+import tempfile
+
+SUPER_SMALL_TEST_FILE = "./data/super_small_test.txt"
 
 class TestTrie(unittest.TestCase):
     def setUp(self):
-        self.trie = CharTrie()
+        self.trie = create_index("trie")
         self.queries = {}
 
     def _iterate_trie(self, trie):
@@ -86,6 +111,61 @@ class TestTrie(unittest.TestCase):
         assert self._iterate_trie(self.trie) == input_length
         self.trie.clear()
 
+    def test_posting_store(self):
+        input_query_in_trie(self.trie, 1, MatchType.HAMMING.value, 1, ['hello'])
+        input_query_in_trie(self.trie, 2, MatchType.EXACT.value, 0, ['hello'])
+
+        # the query word is only stored once
+        assert self.trie.postings.words == ['hello']
+        assert self._iterate_trie(self.trie) == len(self.trie.postings) == 7
+
+        # "hllo" is "hello" with the second character deleted
+        row, = self.trie['hllo']
+        assert self.trie.postings.get(row) == (1, MatchType.HAMMING.value, 1, 0b10, 'hello')
+
+        delete_query_from_trie(self.trie, 1, ['hello'], MatchType.HAMMING, 1)
+        assert len(self.trie.postings) == 1
+
+        index_stats = self.trie.stats()
+        assert index_stats['postings'] == 1
+        assert index_stats['bytes_per_posting'] > 0
+
+    def test_tombstones_and_compaction(self):
+        self.trie.min_compaction_rows = 1000
+        input_query_in_trie(self.trie, 1, MatchType.HAMMING.value, 1, ['hello'])
+        input_query_in_trie(self.trie, 2, MatchType.EXACT.value, 0, ['hello'])
+
+        # the postings of query 1 are dead, but still referenced until the index is compacted
+        delete_query_from_trie(self.trie, 1, ['hello'], MatchType.HAMMING, 1)
+        assert self.trie.stats()['dead_postings'] == 6
+        assert 'hllo' in self.trie
+        assert find_word_matches(self.trie, 'hallo') == set()
+        assert find_word_matches(self.trie, 'hello') == {(2, 'hello')}
+
+        self.trie.compact()
+        assert 'hllo' not in self.trie
+        assert self._iterate_trie(self.trie) == 1
+        assert self.trie.stats()['dead_postings'] == 0
+
+        # the released rows are reused
+        num_rows = len(self.trie.postings.query_ids)
+        input_query_in_trie(self.trie, 3, MatchType.HAMMING.value, 1, ['world'])
+        assert len(self.trie.postings.query_ids) == num_rows
+        assert find_word_matches(self.trie, 'wordd') == {(3, 'world')}
+
+        # removing a share of the postings compacts the index right away
+        self.trie.min_compaction_rows = 0
+        delete_query_from_trie(self.trie, 3, ['world'], MatchType.HAMMING, 1)
+        assert self.trie.stats()['dead_postings'] == 0
+        assert 'wrld' not in self.trie
+
+        # the word of the released rows is released too, its id is reused
+        word_id = self.trie.postings.words.index(None)
+        assert 'world' not in self.trie.postings.word_to_id
+        input_query_in_trie(self.trie, 4, MatchType.EDIT.value, 1, ['there'])
+        assert self.trie.postings.word_to_id['there'] == word_id
+        assert find_word_matches(self.trie, 'thre') == {(4, 'there')}
+
     def _count_combinations(self, n, k_max):
         """
         Calculate the total number of combinations when replacing up to k_max items
@@ -115,6 +195,19 @@ class TestTrie(unittest.TestCase):
 
             assert expected_combinations == len(word_mask_tuples)
 
+    def test_deletion_tables(self):
+        # the numpy batches and the word variants agree, also for characters outside of latin-1
+        words = ['hello', 'wörld', 'h€llo']
+        batch_deletions = get_batch_deletions(words, 2)
+        word_deletions = [(variant, mask, word) for word in words for variant, mask in get_word_deletions(word, 2)]
+
+        self.assertEqual(sorted(batch_deletions), sorted(word_deletions))
+        self.assertEqual(len(batch_deletions), 3 * self._count_combinations(5, 2))
+        for variant, mask, word in batch_deletions:
+            self.assertEqual(variant, get_deletion(word, mask))
+        self.assertIn(('wrld', 0b10, 'wörld'), batch_deletions)
+        self.assertEqual(get_word_deletions('ab', 3)[-1], ('', 0b11))
+
     def _combined_exact_search(self, query_type):
         self.queries.clear()
         query_distance = 0
@@ -500,6 +593,579 @@ class TestTrie(unittest.TestCase):
         assert matches == set()
 
 
+class TestMaxThroughputCore(unittest.TestCase):
+    def test_in_process(self):
+        run_test_driver(SUPER_SMALL_TEST_FILE, MaxThroughputCore(num_workers=0))
+
+    def test_trie_backend(self):
+        run_test_driver(SUPER_SMALL_TEST_FILE, MaxThroughputCore(num_workers=0, index_backend="trie"))
+
+    def test_numpy_hamming_verifier(self):
+        run_test_driver(SUPER_SMALL_TEST_FILE, MaxThroughputCore(num_workers=0, hamming_verifier="numpy"))
+        run_test_driver(SUPER_SMALL_TEST_FILE, MaxThroughputCore(num_workers=2, hamming_verifier="numpy"))
+
+    def test_worker_pool(self):
+        core = MaxThroughputCore(num_workers=2)
+        run_test_driver(SUPER_SMALL_TEST_FILE, core)
+
+        # the workers are shut down together with the index
+        assert core.worker_pool is None
+
+    def test_worker_pool_query_deltas(self):
+        core = MaxThroughputCore(num_workers=2)
+        core.initialize_index()
+
+        core.start_query(1, "hello world", MatchType.HAMMING.value, 1)
+        core.start_query(2, "couchie", MatchType.EDIT.value, 1)
+        core.match_document(1, "hellx worxd couchi")
+
+        core.end_query(1)
+        core.match_document(2, "hellx worxd couchi")
+
+        _, doc_id, num_res, query_ids = core.get_next_avail_res()
+        assert (doc_id, num_res, query_ids) == (1, 2, {1, 2})
+        _, doc_id, num_res, query_ids = core.get_next_avail_res()
+        assert (doc_id, num_res, query_ids) == (2, 1, {2})
+
+        core.destroy_index()
+
+    def test_match_documents(self):
+        core = MaxThroughputCore(num_workers=2)
+        core.initialize_index()
+
+        core.start_query(1, "hello world", MatchType.HAMMING.value, 1)
+        core.start_query(2, "couchie", MatchType.EDIT.value, 1)
+        core.match_documents([(1, "hellx worxd"), (2, "couchi hello"), (3, "nothing"), (4, "world couchie hello")])
+
+        expected_results = [(1, {1}), (2, {2}), (3, set()), (4, {1, 2})]
+        for expected_doc_id, expected_query_ids in expected_results:
+            _, doc_id, _, query_ids = core.get_next_avail_res()
+            assert (doc_id, query_ids) == (expected_doc_id, expected_query_ids)
+
+        core.destroy_index()
+
+    def test_async_mode(self):
+        run_test_driver(SUPER_SMALL_TEST_FILE, MaxThroughputCore(num_workers=2, async_mode=True, max_queue_depth=2))
+
+        core = MaxThroughputCore(num_workers=0, async_mode=True, max_queue_depth=2)
+        core.initialize_index()
+        core.start_query(1, "hello world", MatchType.HAMMING.value, 1)
+        for doc_id in range(1, 6):
+            assert core.match_document(doc_id, "hellx world") == ErrorCode.EC_SUCCESS
+
+        # the query change waits for the enqueued documents
+        core.end_query(1)
+        core.match_document(6, "hellx world")
+
+        results = core.get_available_results(max_results=4)
+        assert [doc_id for doc_id, _, _ in results] == [1, 2, 3, 4]
+        assert all(query_ids == {1} for _, _, query_ids in results)
+
+        assert core.get_next_avail_res()[1:] == (5, 1, {1})
+        # blocks until the last document is matched
+        assert core.get_next_avail_res()[1:] == (6, 0, set())
+        assert core.get_next_avail_res()[0] == ErrorCode.EC_NO_AVAIL_RES
+
+        core.destroy_index()
+
+    def test_match_cache(self):
+        core = MaxThroughputCore(num_workers=0, cache_size=10)
+        core.initialize_index()
+
+        core.start_query(1, "hello", MatchType.EDIT.value, 1)
+        core.start_query(2, "hello world", MatchType.EXACT.value, 0)
+        core.match_document(1, "hello hello world")
+        core.match_document(2, "hello world")
+        assert core.match_cache.stats()['hits'] == 2
+
+        # end_query only updates the cached entries of the query
+        core.end_query(2)
+        core.match_document(3, "hello world")
+
+        # start_query invalidates the cache
+        core.start_query(3, "world", MatchType.EXACT.value, 0)
+        core.match_document(4, "hello world")
+
+        expected_results = [(1, {1, 2}), (2, {1, 2}), (3, {1}), (4, {1, 3})]
+        for expected_doc_id, expected_query_ids in expected_results:
+            _, doc_id, _, query_ids = core.get_next_avail_res()
+            assert (doc_id, query_ids) == (expected_doc_id, expected_query_ids)
+
+        core.destroy_index()
+
+    def test_stats(self):
+        for num_workers in [0, 2]:
+            core = MaxThroughputCore(num_workers=num_workers, cache_size=0, collect_stats=True, stats_dump_interval=0)
+            core.initialize_index()
+
+            core.start_query(1, "hello", MatchType.EDIT.value, 1)
+            core.start_query(2, "world", MatchType.HAMMING.value, 1)
+            with self.assertLogs(level="INFO") as logs:
+                core.match_documents([(1, "hallo world"), (2, "hello")])
+            assert "Core stats" in logs.output[0]
+
+            stats = core.get_stats()
+            assert stats['counters']['documents'] == 2
+            assert stats['counters']['distinct_words'] == 3
+            assert stats['counters']['hits'] == stats['counters']['results'] == 3
+            assert stats['counters']['deletions'] > 0 and stats['counters']['probes'] > 0
+            assert stats['verifications']['EDIT'] > 0 and stats['verifications']['HAMMING'] > 0
+            assert stats['index']['postings'] > 0
+            assert {word for _, word, _ in stats['slowest_words']} == {'hallo', 'world', 'hello'}
+
+            core.reset_stats()
+            stats = core.get_stats()
+            assert stats['counters']['documents'] == stats['counters']['postings_scanned'] == 0
+            assert stats['phase_times']['lookup'] == 0.0
+            core.destroy_index()
+
+        # without collect_stats only the sizes are returned
+        core = MaxThroughputCore(num_workers=0)
+        core.initialize_index()
+        assert 'counters' not in core.get_stats()
+        core.destroy_index()
+        assert ReferenceCore().get_stats() == {}
+
+
+class TestDaskCore(unittest.TestCase):
+    def test_local_schedulers(self):
+        for scheduler in ["threads", "synchronous"]:
+            run_test_driver(SUPER_SMALL_TEST_FILE, DaskCore(scheduler=scheduler, num_partitions=3))
+
+    def test_distributed_query_deltas(self):
+        core = DaskCore(num_workers=2, collect_stats=True)
+        core.initialize_index()
+        assert len(core.worker_pool.actors) == 2
+
+        core.start_query(1, "hello world", MatchType.HAMMING.value, 1)
+        core.start_query(2, "couchie", MatchType.EDIT.value, 1)
+        core.match_document(1, "hellx worxd couchi")
+
+        # the deltas are sent to the actors with the next batch
+        core.end_query(1)
+        assert len(core.worker_pool.index_updates) == 2
+        core.match_document(2, "hellx worxd couchi")
+
+        _, doc_id, num_res, query_ids = core.get_next_avail_res()
+        assert (doc_id, num_res, query_ids) == (1, 2, {1, 2})
+        _, doc_id, num_res, query_ids = core.get_next_avail_res()
+        assert (doc_id, num_res, query_ids) == (2, 1, {2})
+
+        # the lookups are counted on the workers
+        assert core.get_stats()['counters']['hits'] == 3
+        core.destroy_index()
+
+
+class TestShardedCore(unittest.TestCase):
+    def test_sharded(self):
+        run_test_driver(SUPER_SMALL_TEST_FILE, ShardedCore(num_shards=2))
+
+    def test_queries_are_partitioned(self):
+        core = ShardedCore(num_shards=2)
+        core.initialize_index()
+
+        core.start_query(1, "hello world", MatchType.HAMMING.value, 1)
+        core.start_query(2, "world", MatchType.EXACT.value, 0)
+        core.start_query(3, "couchie", MatchType.EDIT.value, 1)
+        assert core.start_query(3, "couchie", MatchType.EDIT.value, 1) == ErrorCode.EC_FAIL
+
+        # every shard only indexes the terms of its own queries
+        shard_stats = core.get_stats()['shards']
+        assert [stats['queries']['queries'] for stats in shard_stats] == [1, 2]
+
+        core.match_documents([(1, "hellx world couchi"), (2, "nothing")])
+        core.end_query(3)
+        core.match_document(3, "hellx world couchi")
+
+        expected_results = [(1, {1, 2, 3}), (2, set()), (3, {1, 2})]
+        for expected_doc_id, expected_query_ids in expected_results:
+            _, doc_id, num_res, query_ids = core.get_next_avail_res()
+            assert (doc_id, num_res, query_ids) == (expected_doc_id, len(expected_query_ids), expected_query_ids)
+
+        # the second document only hits the caches of the shards
+        assert all(stats['cache']['hits'] > 0 for stats in core.get_stats()['shards'])
+        core.reset_stats()
+        assert all(stats['cache']['hits'] == stats['cache']['misses'] == 0 for stats in core.get_stats()['shards'])
+
+        core.destroy_index()
+
+
+class TestRapidFuzzCore(unittest.TestCase):
+    def test_rapidfuzz(self):
+        run_test_driver(SUPER_SMALL_TEST_FILE, RapidFuzzCore())
+
+    def test_term_groups(self):
+        core = RapidFuzzCore(num_workers=1)
+        core.initialize_index()
+        core.start_query(1, "hello", MatchType.HAMMING.value, 1)
+        core.start_query(2, "hello", MatchType.EDIT.value, 1)
+        core.start_query(3, "hello", MatchType.EXACT.value, 0)
+        core.start_query(4, "hello", MatchType.HAMMING.value, 2)
+
+        # the hamming distance is only defined for words of the same length
+        core.match_documents([(1, "hell"), (2, "hellx"), (3, "hello"), (4, "hexxo")])
+        expected_results = [(1, {2}), (2, {1, 2, 4}), (3, {1, 2, 3, 4}), (4, {4})]
+        assert [(doc_id, query_ids) for doc_id, _, query_ids in core.get_available_results()] == expected_results
+
+        core.end_query(1)
+        core.end_query(3)
+        core.match_document(5, "hello")
+        assert core.get_next_avail_res()[1:] == (5, 2, {2, 4})
+        assert core.get_stats()['term_groups'] == 2
+        core.destroy_index()
+
+
+class TestBKTreeCore(unittest.TestCase):
+    def test_bk_tree_core(self):
+        run_test_driver(SUPER_SMALL_TEST_FILE, BKTreeCore())
+
+    def test_search_and_remove(self):
+        reference_core = ReferenceCore()
+        words = ["hello", "hallo", "help", "world", "word", "sword", "couchie", "ouxhiex", "helloo"]
+        tree = BKTree(reference_core.edit_distance)
+        for term_id, word in enumerate(words):
+            tree.add(word, term_id)
+
+        for radius in range(4):
+            expected_term_ids = {term_id for term_id, word in enumerate(words) if reference_core.edit_distance("hello", word) <= radius}
+            assert set(tree.search("hello", radius)) == expected_term_ids
+
+        # the removed terms are only routing nodes until the tree is rebuilt
+        for word in words[:4]:
+            tree.remove(word)
+        assert tree.num_nodes == len(words) and len(tree) == 5
+        tree.remove("word")
+        assert tree.num_nodes == len(tree) == 4
+        assert set(tree.search("hello", 1)) == {8}
+
+        tree.add("hello", 9)
+        assert set(tree.search("hello", 1)) == {8, 9}
+        with self.assertRaises(Exception):
+            tree.remove("hallo")
+
+
+class TestWordMatchCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = WordMatchCache(maxsize=2)
+        cache.put("a", {(1, "a")})
+        cache.put("b", set())
+        assert cache.get("a") == {(1, "a")}
+
+        # "b" is the least recently used word
+        cache.put("c", {(2, "c")})
+        assert cache.get("b") is None
+        assert cache.get("c") == {(2, "c")}
+
+        stats = cache.stats()
+        assert (stats['size'], stats['hits'], stats['misses'], stats['evictions']) == (2, 2, 1, 1)
+
+    def test_invalidation(self):
+        cache = WordMatchCache(maxsize=10)
+        cache.put("a", {(1, "a"), (2, "a")})
+        cache.put("b", {(2, "b")})
+
+        cache.remove_term(2)
+        assert cache.get("a") == {(1, "a")}
+        assert cache.get("b") == set()
+
+        cache.add_term(3)
+        assert cache.get("a") is None
+        assert cache.get("b") is None
+
+
+class TestLengthPartitionedIndex(unittest.TestCase):
+    def test_length_filter(self):
+        index = LengthPartitionedIndex("hash")
+        index.insert_query(1, MatchType.HAMMING, 2, ['hello'])
+        index.insert_query(2, MatchType.EDIT, 1, ['couchie'])
+
+        # hamming terms only reach words of the same length, edit terms words within their distance
+        partition_5, partition_7 = index.partitions[5], index.partitions[7]
+        assert index._get_length_plan(3) == (-1, [[], [], [], []])
+        assert index._get_length_plan(5) == (2, [[partition_5], [partition_5], [partition_5], []])
+        # a 6 letter word can only hit the 7 letter edit term (distance 1) without deletions
+        assert index._get_length_plan(6) == (0, [[partition_7], [], [], []])
+        assert index._get_length_plan(8) == (1, [[], [partition_7], [], []])
+
+        assert index.find_word_matches('hexxo') == {(1, 'hello')}
+        assert index.find_word_matches('couchi') == {(2, 'couchie')}
+        assert index.find_word_matches('hell') == set()
+
+        # empty partitions are dropped together with their summary
+        index.delete_query(2, MatchType.EDIT, 1, ['couchie'])
+        assert list(index.partitions) == [5]
+        assert index._get_length_plan(6)[0] == -1
+        assert index.stats()['live_terms'] == {(MatchType.HAMMING.value, 5, 2): 1}
+
+    def test_signature_index(self):
+        index = LengthPartitionedIndex("hash", signature_threshold=10)
+        index.insert_query(1, MatchType.EDIT, 3, ['internationalization'])
+        index.insert_query(2, MatchType.HAMMING, 1, ['abcdefghijkl'])
+        index.insert_query(3, MatchType.EXACT, 0, ['abcdefghijkl'])
+        index.insert_query(4, MatchType.EDIT, 1, ['hello'])
+
+        # the long terms have no deletion partition, the choice is visible in the stats
+        stats = index.stats()
+        assert list(index.partitions) == [5] and stats['signature_threshold'] == 10
+        assert stats['signature_index']['terms'] == 3 and stats['signature_index']['layouts'] == {(20, 4, True): 1, (12, 2, False): 1, (12, 1, False): 1}
+
+        assert index.find_word_matches('internationalisatio') == {(1, 'internationalization')}
+        assert index.find_word_matches('xnternatxonalizatxon') == {(1, 'internationalization')}
+        assert index.find_word_matches('internxxxxnalization') == set()
+        assert index.find_word_matches('abcdefghijkx') == {(2, 'abcdefghijkl')}
+        assert index.find_word_matches('abcdefghijkl') == {(2, 'abcdefghijkl'), (3, 'abcdefghijkl')}
+        assert index.find_word_matches('bcdefghijklm') == set()
+        assert index.find_word_matches('hellx') == {(4, 'hello')}
+
+        index.delete_query(1, MatchType.EDIT, 3, ['internationalization'])
+        assert index.find_word_matches('internationalisatio') == set()
+        assert index.size()['signature_terms'] == 2
+
+
+class TestTermRegistry(unittest.TestCase):
+    def test_shared_terms(self):
+        registry = TermRegistry()
+
+        assert [term for _, term in registry.add_query(1, ['diocese', 'pgdma'], MatchType.HAMMING, 2)] == ['diocese', 'pgdma']
+        # the same terms with the same match type and distance are only indexed once
+        assert registry.add_query(2, ['pgdma', 'diocese'], MatchType.HAMMING, 2) == []
+        assert [term for _, term in registry.add_query(3, ['pgdma', 'pgdma'], MatchType.EDIT, 2)] == ['pgdma']
+        assert registry.stats()['distinct_terms'] == 3
+
+        diocese_id = registry.term_ids[('diocese', MatchType.HAMMING.value, 2)]
+        pgdma_id = registry.term_ids[('pgdma', MatchType.HAMMING.value, 2)]
+        assert registry.get_query_matches({diocese_id, pgdma_id}) == {1, 2}
+        assert registry.get_query_matches({pgdma_id}) == set()
+
+        # the terms stay in the index as long as one query uses them
+        assert registry.remove_query(1) == []
+        assert sorted(term for _, term in registry.remove_query(2)) == ['diocese', 'pgdma']
+        assert registry.get_query_matches({diocese_id, pgdma_id}) == set()
+
+    def test_selectivity_anchors(self):
+        registry = TermRegistry()
+        registry.selectivity = TermSelectivity(window=4)
+        registry.add_query(1, ['common', 'rare'], MatchType.EXACT, 0)
+        registry.add_query(2, ['common'], MatchType.EXACT, 0)
+        common_id, rare_id = registry.term_ids[('common', 0, 0)], registry.term_ids[('rare', 0, 0)]
+
+        # without statistics the terms keep their order
+        assert registry.anchor_queries == {common_id: {1, 2}}
+        for _ in range(3):
+            assert registry.get_query_matches({common_id}) == {2}
+        assert registry.selectivity.hit_rate(common_id) == 1.0
+
+        # the counts are halved after a window of documents and the queries are anchored at their rarest term
+        assert registry.get_query_matches({common_id, rare_id}) == {1, 2}
+        assert registry.selectivity.num_documents == 2
+        assert registry.query_terms[1] == (rare_id, common_id)
+        assert registry.anchor_queries == {common_id: {2}, rare_id: {1}}
+
+        # new queries are ordered by the current statistics
+        registry.add_query(3, ['common', 'new'], MatchType.EXACT, 0)
+        assert registry.query_terms[3][1] == common_id
+
+        registry.remove_query(1)
+        assert rare_id not in registry.anchor_queries and rare_id not in registry.selectivity.term_hits
+
+    def test_selectivity_window(self):
+        selectivity = TermSelectivity(window=4)
+        refreshes = [selectivity.add_document(['common'], ['common', 'skipped']) for _ in range(12)]
+        # refreshed at 1, 2 and every window documents after that
+        assert [i + 1 for i, refresh in enumerate(refreshes) if refresh] == [1, 2, 4, 8, 12]
+
+        # a term that is skipped is not a miss, only the documents it was checked against count
+        selectivity.add_document([], ['common', 'skipped'])
+        selectivity.add_document(['skipped'], ['skipped'])
+        assert selectivity.hit_rate('common') < 1.0
+        assert selectivity.order(['skipped', 'common', 'new']) == ['new', 'skipped', 'common']
+
+
+class TestTrace(unittest.TestCase):
+    def test_compile_and_replay(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            trace_path = os.path.join(temp_dir, "super_small_test.trace")
+            compile_trace(SUPER_SMALL_TEST_FILE, trace_path)
+
+            with open_trace(trace_path) as trace:
+                # s 1 0 0 3 edit gaither anderson
+                assert (trace.codes[0], trace.ids[0], trace.args[0], trace.dists[0]) == (0, 1, 0, 0)
+                assert [trace.vocabulary[trace.words[i]] for i in range(trace.word_offsets[0], trace.word_offsets[1])] == ['edit', 'gaither', 'anderson']
+
+            run_trace_driver(trace_path, MaxThroughputCore(num_workers=0))
+
+
+class TestSnapshot(unittest.TestCase):
+    def _match(self, core, doc_id, content):
+        core.match_document(doc_id, content)
+        err, result_doc_id, num_res, query_ids = core.get_next_avail_res()
+        assert err == ErrorCode.EC_SUCCESS and result_doc_id == doc_id
+        return set(query_ids)
+
+    def test_save_and_load(self):
+        core = MaxThroughputCore(num_workers=0)
+        core.initialize_index()
+        core.start_query(1, "hello world", MatchType.EXACT.value, 0)
+        core.start_query(2, "hello", MatchType.HAMMING.value, 1)
+        core.start_query(3, "wrld", MatchType.EDIT.value, 1)
+        core.start_query(4, "gone", MatchType.EXACT.value, 0)
+        core.end_query(4)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            snapshot_path = os.path.join(temp_dir, "index.snapshot")
+            core.save_snapshot(snapshot_path)
+
+            loaded_core = MaxThroughputCore(num_workers=0)
+            loaded_core.initialize_index()
+            loaded_core.load_snapshot(snapshot_path)
+
+            # the partitions are decoded when they are first used
+            assert None in loaded_core.trie.partitions.values()
+            assert loaded_core.queries == core.queries
+            assert loaded_core.term_registry.stats() == core.term_registry.stats()
+
+            for doc_id, content in enumerate(["hello world", "hallo world", "hello word", "gone"]):
+                assert self._match(loaded_core, doc_id, content) == self._match(core, doc_id, content)
+
+            # the loaded index can still be changed
+            loaded_core.start_query(5, "hellp", MatchType.HAMMING.value, 1)
+            loaded_core.end_query(2)
+            assert self._match(loaded_core, 10, "hello") == {5}
+            assert loaded_core.trie.snapshot is None
+            loaded_core.destroy_index()
+
+            # the hamming terms of a core with the numpy verifier have no postings, they are restored either way
+            numpy_core = MaxThroughputCore(num_workers=0, hamming_verifier="numpy")
+            numpy_core.initialize_index()
+            numpy_core.load_snapshot(snapshot_path)
+            assert self._match(numpy_core, 20, "hallo") == {2}
+            numpy_core.save_snapshot(snapshot_path)
+            loaded_core.initialize_index()
+            loaded_core.load_snapshot(snapshot_path)
+            assert self._match(loaded_core, 21, "hallo") == {2}
+            numpy_core.destroy_index()
+            loaded_core.destroy_index()
+
+            # files of another version are rejected
+            with open(snapshot_path, "r+b") as snapshot_file:
+                snapshot_file.seek(8)
+                snapshot_file.write(struct.pack("<I", 0))
+            with self.assertRaises(Exception):
+                Snapshot(snapshot_path)
+
+        core.destroy_index()
+
+    def test_worker_pool_snapshot(self):
+        # with a worker pool the index only lives in the workers, the first one writes the snapshot
+        pool_core = MaxThroughputCore(num_workers=2)
+        pool_core.initialize_index()
+        pool_core.start_query(1, "hello world", MatchType.EXACT.value, 0)
+        pool_core.start_query(2, "wrld", MatchType.EDIT.value, 1)
+        assert pool_core.trie.partitions == {}
+        assert pool_core.get_stats()['index']['postings'] > 0
+
+        core = MaxThroughputCore(num_workers=0)
+        core.initialize_index()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            snapshot_path = os.path.join(temp_dir, "index.snapshot")
+            pool_core.save_snapshot(snapshot_path)
+            core.load_snapshot(snapshot_path)
+            assert self._match(core, 1, "hello world") == self._match(pool_core, 1, "hello world") == {1, 2}
+
+            core.start_query(3, "hallo", MatchType.HAMMING.value, 1)
+            core.save_snapshot(snapshot_path)
+            pool_core.load_snapshot(snapshot_path)
+            assert self._match(pool_core, 2, "hello wrld") == self._match(core, 2, "hello wrld") == {2, 3}
+            assert pool_core.trie.partitions == {}
+
+        pool_core.destroy_index()
+        core.destroy_index()
+
+    def test_long_terms(self):
+        # the masks of terms longer than 64 characters do not fit in 64 bits
+        long_term = "a" * 40 + "b" * 30
+        typo = "a" * 40 + "c" + "b" * 29
+        core = MaxThroughputCore(num_workers=1, index_backend="trie", signature_threshold=None)
+        core.initialize_index()
+        assert core.start_query(1, long_term, MatchType.EDIT.value, 1) == ErrorCode.EC_SUCCESS
+        assert core.start_query(2, long_term, MatchType.HAMMING.value, 2) == ErrorCode.EC_SUCCESS
+        assert self._match(core, 1, typo) == {1, 2}
+        core.destroy_index()
+
+        core = MaxThroughputCore(num_workers=0, signature_threshold=None)
+        core.initialize_index()
+        core.start_query(1, long_term, MatchType.EDIT.value, 1)
+        core.start_query(2, long_term, MatchType.HAMMING.value, 2)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            snapshot_path = os.path.join(temp_dir, "index.snapshot")
+            core.save_snapshot(snapshot_path)
+            loaded_core = MaxThroughputCore(num_workers=0, signature_threshold=None)
+            loaded_core.initialize_index()
+            loaded_core.load_snapshot(snapshot_path)
+            assert self._match(loaded_core, 1, typo) == {1, 2}
+            assert self._match(loaded_core, 2, long_term[1:] + "x") == {2}
+            loaded_core.end_query(1)
+            assert self._match(loaded_core, 3, typo) == {2}
+            loaded_core.destroy_index()
+        core.destroy_index()
+
+
+class TestWorkloadGenerator(unittest.TestCase):
+    def test_generated_workload(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_path = os.path.join(temp_dir, "workload.txt")
+            for vocabulary in ["lorem", "random"]:
+                generate_workload(test_path, num_queries=30, num_documents=10, document_length=(5, 20), query_churn=0.5,
+                                  vocabulary=vocabulary, vocabulary_size=100, typo_rate=0.3)
+
+                with open(test_path, "r") as test_file:
+                    commands = [line.split()[0] for line in test_file]
+                assert commands.count('s') == 30 + commands.count('e')
+                assert commands.count('m') == commands.count('r') == 10
+
+                # the expected results come from the reference core
+                run_test_driver(test_path, MaxThroughputCore(num_workers=0))
+                run_test_driver(test_path, ReferenceCore())
+
+
+class TestHammingVerifier(unittest.TestCase):
+    def test_packed_and_unpacked_words(self):
+        verifier = HammingVerifier()
+        terms = ["hello", "hellx", "abcdefghij", "abcdefghxx", "héllo"]
+        for term_id, term in enumerate(terms):
+            verifier.add_term(term_id, term, 1)
+
+        # words of up to 8 characters are compared packed into an uint64, the longer ones as matrices
+        assert verifier.find_words_matches(["hellq", "abcdefghix", "world", "hell", "hèllo"]) == {
+            'hellq': {(0, 'hello'), (1, 'hellx')},
+            'abcdefghix': {(2, 'abcdefghij'), (3, 'abcdefghxx')},
+            'hèllo': {(0, 'hello'), (4, 'héllo')},
+        }
+
+        verifier.remove_term(1, "hellx")
+        verifier.remove_term(4, "héllo")
+        assert verifier.find_words_matches(["hellq", "hèllx"]) == {'hellq': {(0, 'hello')}}
+
+    def test_popcount_fallback(self):
+        # the byte sum that replaces np.bitwise_count before numpy 2.0
+        values = np.array([0, 0x80, 0x8000000000000080, 0x8080808080808080, 0x0080008000800080], dtype=np.uint64) & HIGH_BITS
+        assert sum_byte_high_bits(values).tolist() == [0, 1, 2, 8, 4]
+
+
+class TestVerification(unittest.TestCase):
+    def test_bounded_levenshtein_distance(self):
+        word_pairs = [('hello', 'hello'), ('hello', 'hell'), ('hello', 'helxlo'), ('couchie', 'ouxhiex'),
+                      ('kitten', 'sitting'), ('', 'abc'), ('abc', ''), ('airport', 'airlines')]
+        reference_core = ReferenceCore()
+
+        for word_1, word_2 in word_pairs:
+            distance = reference_core.edit_distance(word_1, word_2)
+            for max_dist in range(4):
+                expected_distance = distance if distance <= max_dist else max_dist + 1
+                assert bounded_levenshtein_distance(word_1, word_2, max_dist) == expected_distance, (word_1, word_2, max_dist)
+                # the banded DP of the reference core
+                assert reference_core.edit_distance(word_1, word_2, max_dist) == expected_distance, (word_1, word_2, max_dist)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -7,16 +7,30 @@ import sys
 # since we are using the same testing code for all different implementations,
 # let's add the correct class to the test driver.
 
+def flush_document_batch(core_class, document_batch):
+    if not document_batch:
+        return
+
+    logging.debug(f"MatchDocuments: {len(document_batch)} documents")
+    err = core_class.match_documents(document_batch)
+    assert err == ErrorCode.EC_SUCCESS, f"Error in MatchDocuments: {err}"
+    document_batch.clear()
+
 @timeit
-def run_test_driver(test_fp, core_class): 
+def run_test_driver(test_fp, core_class, max_batch_size=1000): 
     logging.info("Starting Test...")
     
     core_class.initialize_index()
 
+    # consecutive documents (between two query changes or retrievals) are matched together in one batch
+    document_batch = []
+
     logging.info(f"Reading test file: {test_fp}")
     with open(test_fp, "r") as test_file:
         for line_num, line in enumerate(test_file):
-            print(line_num, end="\r")
+            # printing every line slows the driver down noticeably
+            if line_num % 1000 == 0:
+                print(line_num, end="\r")
             line = line.strip()
 
             # skip empty lines
@@ -30,6 +44,9 @@ def run_test_driver(test_fp, core_class):
             ch = line_tokens[0] # command character
             id = int(line_tokens[1]) # either query_id or doc_id
 
+            if ch != 'm' or len(document_batch) >= max_batch_size:
+                flush_document_batch(core_class, document_batch)
+
             match ch:
                 case 's': # s:start_query <query_id> <match_type> <match_dist> <num_keywords> list<keywords>
                     match_type = int(line_tokens[2])
@@ -50,8 +67,7 @@ def run_test_driver(test_fp, core_class):
                 case 'm': # m:match_document <doc_id> <content>
                     document_content = " ".join(line_tokens[3:])
                     logging.debug(f"MatchDocument: ID={id}, Content: {document_content[:50]}")
-                    err = core_class.match_document(id, document_content)
-                    assert err == ErrorCode.EC_SUCCESS, f"Error in MatchDocument: {err}"
+                    document_batch.append((id, document_content))
                 
                 case 'r': # r:retrieve <doc_id> <num_res> list<query_ids>
                     expected_num_res = int(line_tokens[2])
@@ -75,15 +91,17 @@ def run_test_driver(test_fp, core_class):
                 case _:
                     raise Exception(f"Corrupted Test File. Unknown Command '{ch}'.")
 
+    flush_document_batch(core_class, document_batch)
     core_class.destroy_index()
-    logging.info(f"Your program has successfully passed all tests in file {file_path}.")
+    logging.info(f"Your program has successfully passed all tests in file {test_fp}.")
 
 if __name__ == "__main__":
     logging.getLogger().setLevel(logging.INFO) # Change to logging.DEBUG for more detailed logs
 
     # parse the users args:
     # first args: sets the file path, 0 for super small test, 1 for small test, 2 for large test
-    # second args: sets the implementation to test, 0 for reference, 1 for max throughput, 2 for dask
+    # second args: sets the implementation to test, 0 for reference, 1 for max throughput, 2 for dask, 3 for query sharded, 4 for rapidfuzz, 5 for bk-tree
+    # optional third args: "trace" replays the compiled binary trace of the test file (compiled on first use)
 
     test_file_args = sys.argv[1]
     implementation_args = sys.argv[2]
@@ -112,9 +130,30 @@ if __name__ == "__main__":
         case "2":
             from dask_core import DaskCore as Current_test_core
             logging.info("Running dask implementation")
+        case "3":
+            from sharded_core import ShardedCore as Current_test_core
+            logging.info("Running query sharded implementation")
+        case "4":
+            from rapidfuzz_core import RapidFuzzCore as Current_test_core
+            logging.info("Running rapidfuzz implementation")
+        case "5":
+            from bk_tree_core import BKTreeCore as Current_test_core
+            logging.info("Running bk-tree implementation")
         case _:
             from max_throughput_core import MaxThroughputCore as Current_test_core
             logging.info("no user input, Running max throughput implementation")
 
     core = Current_test_core()
-    run_test_driver(file_path, core)
+
+    if len(sys.argv) > 3 and sys.argv[3] == "trace":
+        import os
+        from trace_utils import compile_trace, run_trace_driver
+
+        trace_path = os.path.splitext(file_path)[0] + ".trace"
+        if not os.path.exists(trace_path):
+            logging.info(f"Compiling {file_path} into {trace_path}")
+            compile_trace(file_path, trace_path)
+
+        run_trace_driver(trace_path, core)
+    else:
+        run_test_driver(file_path, core)
@@ -0,0 +1,185 @@
+# Compiled binary traces of the test files, so that the cores can be benchmarked without the text parser.
+# usage: python3 trace_utils.py <test file> <trace file>
+#
+# A trace is a columnar file: one column for the command codes, the ids and the arguments of every line,
+# and one array with the word ids of all lines. The words are interned in a vocabulary at the end of the file.
+# The replay driver memory-maps the file and reads the columns in place, no line is split or stripped.
+from array import array
+from contextlib import contextmanager
+import logging
+import mmap
+import struct
+import sys
+
+from core_utils import ErrorCode
+from test_core import flush_document_batch
+from testing_utils import timeit
+
+TRACE_MAGIC = b"DIATRACE"
+TRACE_VERSION = 1
+
+# magic, version, byte order, number of commands, number of word references, vocabulary size, vocabulary bytes
+TRACE_HEADER = struct.Struct("<8sIIQQQQ")
+
+COMMAND_CODES = {'s': 0, 'e': 1, 'm': 2, 'r': 3}
+START_QUERY, END_QUERY, MATCH_DOCUMENT, GET_RESULT = range(4)
+
+def _padding(offset):
+    # every column starts at a multiple of 8 bytes, so it can be cast in place
+    return -offset % 8
+
+def compile_trace(test_fp, trace_fp):
+    """
+    Compiles a test file into a binary trace.
+    s <query_id> <match_type> <match_dist> <num_keywords> list<keywords> -> id, arg=match_type, dist=match_dist, words=keywords
+    e <query_id> -> id
+    m <doc_id> <num_words> list<words> -> id, words=words
+    r <doc_id> <num_res> list<query_ids> -> id, arg=num_res, words=query ids (not interned)
+    """
+    codes = array('B')
+    ids = array('I')
+    args = array('I')
+    dists = array('B')
+    word_offsets = array('Q', [0])
+    words = array('I')
+
+    vocabulary = {}
+
+    with open(test_fp, "r") as test_file:
+        for line in test_file:
+            line_tokens = line.split()
+            if not line_tokens:
+                continue
+
+            ch = line_tokens[0]
+            if ch not in COMMAND_CODES:
+                raise Exception(f"Corrupted Test File. Unknown Command '{ch}'.")
+
+            codes.append(COMMAND_CODES[ch])
+            ids.append(int(line_tokens[1]))
+
+            match ch:
+                case 's':
+                    args.append(int(line_tokens[2]))
+                    dists.append(int(line_tokens[3]))
+                    words.extend(vocabulary.setdefault(word, len(vocabulary)) for word in line_tokens[5:])
+                case 'e':
+                    args.append(0)
+                    dists.append(0)
+                case 'm':
+                    args.append(0)
+                    dists.append(0)
+                    words.extend(vocabulary.setdefault(word, len(vocabulary)) for word in line_tokens[3:])
+                case 'r':
+                    args.append(int(line_tokens[2]))
+                    dists.append(0)
+                    words.extend(int(query_id) for query_id in line_tokens[3:])
+
+            word_offsets.append(len(words))
+
+    vocabulary_offsets = array('Q', [0])
+    vocabulary_bytes = bytearray()
+    for word in vocabulary: # dicts keep the insertion order, which is the order of the ids
+        vocabulary_bytes += word.encode("utf-8")
+        vocabulary_offsets.append(len(vocabulary_bytes))
+
+    byte_order = 0 if sys.byteorder == "little" else 1
+    header = TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, byte_order, len(codes), len(words), len(vocabulary), len(vocabulary_bytes))
+
+    with open(trace_fp, "wb") as trace_file:
+        offset = trace_file.write(header)
+        for column in (codes, ids, args, dists, word_offsets, words, vocabulary_offsets, vocabulary_bytes):
+            offset += trace_file.write(b"\0" * _padding(offset))
+            offset += trace_file.write(column)
+
+class Trace:
+    """
+    Read only view on a memory-mapped trace file. The columns are memoryviews on the mapped file.
+    """
+    def __init__(self, trace_file):
+        self.mmap = mmap.mmap(trace_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buffer = memoryview(self.mmap)
+
+        magic, version, byte_order, num_commands, num_words, vocabulary_size, vocabulary_bytes = TRACE_HEADER.unpack_from(self.buffer)
+        if magic != TRACE_MAGIC:
+            raise Exception("Not a trace file.")
+        if version != TRACE_VERSION:
+            raise Exception(f"Unsupported trace version {version}, expected {TRACE_VERSION}.")
+        if byte_order != (0 if sys.byteorder == "little" else 1):
+            raise Exception("The trace was compiled on a machine with a different byte order.")
+
+        self.num_commands = num_commands
+        self.columns = []
+        offset = TRACE_HEADER.size
+        column_layout = [('B', num_commands), ('I', num_commands), ('I', num_commands), ('B', num_commands),
+                         ('Q', num_commands + 1), ('I', num_words), ('Q', vocabulary_size + 1), ('B', vocabulary_bytes)]
+        for typecode, length in column_layout:
+            offset += _padding(offset)
+            size = length * array(typecode).itemsize
+            self.columns.append(self.buffer[offset:offset + size].cast(typecode))
+            offset += size
+
+        self.codes, self.ids, self.args, self.dists, self.word_offsets, self.words, vocabulary_offsets, vocabulary_column = self.columns
+
+        # the vocabulary is decoded once, the commands only refer to it by id
+        self.vocabulary = [bytes(vocabulary_column[vocabulary_offsets[i]:vocabulary_offsets[i + 1]]).decode("utf-8") for i in range(vocabulary_size)]
+        self.columns.extend([vocabulary_offsets, vocabulary_column])
+
+    def close(self):
+        for column in self.columns:
+            column.release()
+        self.buffer.release()
+        self.mmap.close()
+
+@contextmanager
+def open_trace(trace_fp):
+    with open(trace_fp, "rb") as trace_file:
+        trace = Trace(trace_file)
+        try:
+            yield trace
+        finally:
+            trace.close()
+
+@timeit
+def run_trace_driver(trace_fp, core_class, max_batch_size=1000):
+    """
+    Replays a compiled trace against a core, like run_test_driver does for the text files.
+    """
+    core_class.initialize_index()
+
+    with open_trace(trace_fp) as trace:
+        codes, ids, args, dists, word_offsets, words, vocabulary = trace.codes, trace.ids, trace.args, trace.dists, trace.word_offsets, trace.words, trace.vocabulary
+        document_batch = []
+
+        for command in range(trace.num_commands):
+            code = codes[command]
+            id = ids[command]
+            word_positions = range(word_offsets[command], word_offsets[command + 1])
+
+            if code != MATCH_DOCUMENT or len(document_batch) >= max_batch_size:
+                flush_document_batch(core_class, document_batch)
+
+            if code == START_QUERY:
+                err = core_class.start_query(id, " ".join([vocabulary[words[word]] for word in word_positions]), args[command], dists[command])
+                assert err == ErrorCode.EC_SUCCESS, f"Error in StartQuery: {err}"
+            elif code == END_QUERY:
+                err = core_class.end_query(id)
+                assert err == ErrorCode.EC_SUCCESS, f"Error in EndQuery: {err}"
+            elif code == MATCH_DOCUMENT:
+                document_batch.append((id, " ".join([vocabulary[words[word]] for word in word_positions])))
+            else:
+                err, predicted_doc_id, predicted_num_res, predicted_query_ids = core_class.get_next_avail_res()
+                assert err == ErrorCode.EC_SUCCESS, f"Error in GetNextAvailRes: {err}"
+                assert predicted_doc_id == id
+                assert predicted_num_res == args[command], f"Predicted Num Res: {predicted_num_res}, Expected Num Res: {args[command]}, command: {command}"
+                assert set(predicted_query_ids) == {words[word] for word in word_positions}
+
+        flush_document_batch(core_class, document_batch)
+
+    core_class.destroy_index()
+    logging.info(f"Your program has successfully passed all tests in trace {trace_fp}.")
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.INFO)
+    compile_trace(sys.argv[1], sys.argv[2])
+    logging.info(f"Compiled {sys.argv[1]} into {sys.argv[2]}.")
@@ -1,74 +1,17 @@
 # %%
-import itertools
 from core_utils import MatchType
-from bitarray import bitarray
-from functools import lru_cache
-from multiprocessing import Pool
-
-def calculate_levenshtein_distance_with_bitmask(barray_str_1, barray_str_2):
-    barray_1 = bitarray(barray_str_1)
-    barray_2 = bitarray(barray_str_2)
-
-    start_index = 0
-    l1 = len(barray_1)
-    l2 = len(barray_2)
-
-
-    while start_index < min(l1, l2):
-        bit1 = barray_1[start_index]
-        bit2 = barray_2[start_index]
-
-        if bit1 == bit2:
-            start_index += 1
-        elif bit2: # bit2 is 1
-            barray_1.insert(start_index, 0)
-            start_index += 1
-            l1 += 1
-        elif bit1: # bit1 is 1
-            barray_2.insert(start_index, 0)
-            start_index += 1
-            l2 += 1
-        else:
-            print(f"Error: {barray_1} {barray_2}, start_index={start_index}")
-
-    # only the trailing ones are left
-    ldiff = l1 - l2
-    if ldiff > 0:
-        barray_2.extend('0' * ldiff)
-    elif ldiff < 0:
-        barray_1.extend('0' * -ldiff)
-    
-    barray_1 |= barray_2
+import time
 
-    return barray_1.count()
-# %%
-@lru_cache(maxsize=None)
-def generate_combinations(array_length, max_ones):
-    result = set()
-    # Add the all-zero mask as a string
-    result.add("0" * array_length)
-    for num_ones in range(1, max_ones + 1):
-        for indices in itertools.combinations(range(array_length), num_ones):
-            bitar = ["0"] * array_length
-            for index in indices:
-                bitar[index] = "1"
-            # Add the string representation of the bitarray
-            result.add("".join(bitar))
-    return result
-
-def get_deletion(word, mask):
-    mask = bitarray(mask)
-    return "".join([letter for letter, keep in zip(word, mask) if keep == 0])
+from posting_store import create_posting_rows, TOMBSTONE
+from verification_utils import is_within_edit_distance
+from deletion_utils import get_deletion, get_deletions, get_word_deletions
 
+# All masks are integers: bit i is set if the character at position i of the word is deleted.
 
+# %%
 def get_deletions_for_document(words, max_dist):
-    word_mask_tuples = set()
-    for original_word in words:
-        combinations = generate_combinations(len(original_word), max_dist)
-        for mask in combinations:
-            word_mask_tuples.add((get_deletion(original_word, mask), mask, original_word))
-    
-    return word_mask_tuples
+    # (variant, mask, word) of every word, generated from the deletion tables (deletion_utils.py)
+    return get_deletions(words, max_dist)
 
 def get_trie_inputs(query_id, query_type, query_dist, query_words):
     trie_inputs = []
@@ -79,105 +22,149 @@ def get_trie_inputs(query_id, query_type, query_dist, query_words):
     return trie_inputs
 
 def input_query_in_trie(trie, query_id, query_type, query_dist, query_words):
+    query_type = MatchType(query_type).value
     query_inputs = get_trie_inputs(query_id, query_type, query_dist, query_words)
     for word, query_info in query_inputs:
-        value = trie.get(word, None)
-        if not value:
-            trie[word] = [query_info]
+        row = trie.postings.append(*query_info)
+        rows = trie.get(word, None)
+        if rows is None:
+            trie[word] = create_posting_rows([row])
+        elif isinstance(rows, range):
+            # keys that are loaded from a snapshot point to a range of rows
+            trie[word] = create_posting_rows([*rows, row])
         else:
-            value.append(query_info)
+            rows.append(row)
 
 def delete_query_from_trie(trie, query_id, terms, match_type, match_dist):
-    query_inputs = get_trie_inputs(query_id, match_type, match_dist, terms)
-    for word, query_info in query_inputs:
-        value = trie[word] # it is garanteed to exist
-        # remove only the query that matches the query_id
-        trie[word] = [query for query in value if query[0] != query_id]
+    # the postings are found through the reverse index of the posting store, the deletion variants of the
+    # terms do not have to be generated again: the index key of a posting is its word without the masked characters.
+    # The removed postings are only marked as dead, the index keys are cleaned up by compact_trie once enough postings are dead.
+    postings = trie.postings
+    for row in postings.remove_query(query_id):
+        trie.dirty_keys.add(get_deletion(postings.words[postings.word_ids[row]], postings.masks[row]))
+
+    if postings.dead_rows >= max(trie.min_compaction_rows, trie.compaction_ratio * len(postings)):
+        compact_trie(trie)
+
+def compact_trie(trie):
+    """
+    Removes the dead postings from the index keys, drops the keys without postings and releases the rows.
+    The cost is amortized over the removals, because it only runs once a share of the postings is dead.
+    """
+    postings = trie.postings
+    for word in trie.dirty_keys:
+        rows = trie.get(word, None)
+        if rows is None:
+            continue
+
+        kept_rows = create_posting_rows()
+        for row in rows:
+            if postings.is_dead(row):
+                postings.release(row)
+            else:
+                kept_rows.append(row)
+
+        if kept_rows:
+            trie[word] = kept_rows
+        else:
+            del trie[word]
+
+    trie.dirty_keys.clear()
 
-def check_exact_match(document_mask_str, query_mask_str):
-    return document_mask_str == query_mask_str
+def check_exact_match(document_mask, query_mask):
+    return document_mask == query_mask
 
-def get_hamming_distance(document_mask_str, query_mask_str):
-    if document_mask_str != query_mask_str:
+def get_hamming_distance(document_mask, query_mask):
+    if document_mask != query_mask:
         return 4  # 4 is bigger than any possible distance
 
-    return document_mask_str.count('1')
+    return document_mask.bit_count()
 
-def find_word_in_trie(trie, word, document_mask_str, original_doc_word):
-    query_infos = trie.get(word, None)
+def find_word_in_trie(trie, word, document_mask, original_doc_word, stats=None):
+    # stats (a CoreStats, see core_stats.py) counts the scanned postings and the verifications
+    rows = trie.get(word, None)
 
-    if not query_infos:
+    if not rows:
         return []
     
+    if stats is not None:
+        stats.counters['postings_scanned'] += len(rows)
+
+    postings = trie.postings
     matching_queries = set()
-    for query_info in query_infos:
-        query_id, query_type, query_dist, query_mask_str, original_query_word = query_info
+    for row in rows:
+        query_id, query_type, query_dist, query_mask, original_query_word = postings.get(row)
+        if query_type == TOMBSTONE:
+            continue
+
+        if stats is not None:
+            stats.verifications[query_type] += 1
 
         match MatchType(query_type):
             case MatchType.EXACT:
-                if check_exact_match(document_mask_str, query_mask_str):
+                if check_exact_match(document_mask, query_mask):
                     matching_queries.add((query_id, original_query_word))
             case MatchType.HAMMING:
-                if get_hamming_distance(document_mask_str, query_mask_str) <= query_dist:
+                if get_hamming_distance(document_mask, query_mask) <= query_dist:
                     matching_queries.add((query_id, original_query_word))
 
             case MatchType.EDIT:
-                # consider removing this and using the library. Python GIL kinda screws with the expected precomputing speedup.
-                lev_dist = calculate_levenshtein_distance_with_bitmask(document_mask_str, query_mask_str)
-
-                # lev_dist = Levenshtein.distance(original_doc_word, original_query_word)
-
-                if lev_dist <= query_dist:
+                # the masks only tell that the words share a deletion variant, the distance is verified on the words.
+                if stats is not None:
+                    start_time = time.perf_counter()
+                within_distance = is_within_edit_distance(original_query_word, original_doc_word, query_dist)
+                if stats is not None:
+                    stats.phase_times['verify'] += time.perf_counter() - start_time
+
+                if within_distance:
                     matching_queries.add((query_id, original_query_word))
             
     return matching_queries
 
-def find_partial_document_matches(input_thruple):
-    # This function returns the partial matches to queries. It is meant to be used with multiprocessing.
-    # The partial matches are then combined to check if a query is found.
-    (trie, doc_words, reference_queries) = input_thruple
-    found_query_words_dict = {key: set() for key in reference_queries}
-
-    for original_word in doc_words:
-        # no query has distance above 3
-        doc_word_mask_tuples = get_deletions_for_document([original_word], max_dist=3)
-        for doc_deleted_word_comb, mask, original_word in doc_word_mask_tuples:
-            results = find_word_in_trie(trie, doc_deleted_word_comb, mask, original_word)
-            
-            # now we need to check if all words in query have been found.
-            if results:
-                for results in results: # found_query_id, query_word
-                    found_query_words_dict[results[0]].add(results[1])
-    
-    return found_query_words_dict
+def find_word_matches(trie, original_word, max_dist=3):
+    # returns all (query_id, query_word) hits of a single document word.
+    # no query has distance above 3
+    word_matches = set()
 
-def combine_partial_document_matches(partial_query_words_dicts, reference_queries):
-    # add match to query only if all words in the query have been found
-    doc_matches = set()
-    # combine all partially found query word dicts
-    combined_query_words_dict = {}
-    for partial_query_words_dict in partial_query_words_dicts:
-        for key, value in partial_query_words_dict.items():
-            combined_query_words_dict[key] = combined_query_words_dict.get(key, set()).union(value)
-    
-    for query_id, query_words in combined_query_words_dict.items():
-        # the length comparison should work because we're handling dicts.
-        if len(query_words) == len(reference_queries[query_id]["terms"]):
-            doc_matches.add(query_id)
-    
-    return doc_matches
+    for doc_deleted_word_comb, mask in get_word_deletions(original_word, max_dist):
+        word_matches.update(find_word_in_trie(trie, doc_deleted_word_comb, mask, original_word))
 
-def find_document_matches(trie, doc_words, reference_queries):
-    num_cores = 4
+    return word_matches
 
-    partial_doc_words = [doc_words[i::num_cores] for i in range(num_cores)]
-    inputs = [(trie, partial_doc_word, reference_queries) for partial_doc_word in partial_doc_words]
+def find_words_matches(trie, doc_words):
+    # returns the hits of every distinct document word. Words without hits are left out.
+    # the index has to provide find_word_matches(word), see index_backends.py and partitioned_index.py.
+    # The hits are cached by the core (see MaxThroughputCore._find_words_matches), not here.
+    words_matches = {}
 
-    with Pool(num_cores) as p:
-        partial_found_query_words_dicts = p.map(find_partial_document_matches, inputs)
+    for original_word in set(doc_words):
+        word_matches = trie.find_word_matches(original_word)
+        if word_matches:
+            words_matches[original_word] = word_matches
 
-    doc_matches = combine_partial_document_matches(partial_found_query_words_dicts, reference_queries)
+    return words_matches
+
+def collect_query_words(words_matches):
+    # turns the hits per document word into the found words per query. Only queries with hits get an entry.
+    found_query_words_dict = {}
+
+    for word_matches in words_matches.values():
+        for found_query_id, query_word in word_matches:
+            found_query_words = found_query_words_dict.get(found_query_id, None)
+            if found_query_words is None:
+                found_query_words_dict[found_query_id] = {query_word}
+            else:
+                found_query_words.add(query_word)
+
+    return found_query_words_dict
+
+def find_document_matches(trie, doc_words, reference_queries):
+    # returns the ids of the queries whose words are all found in the document. Matched in the calling process,
+    # the cores spread the lookups over their long lived workers instead (see worker_pool.py).
+    found_query_words_dict = collect_query_words(find_words_matches(trie, doc_words))
 
-    return doc_matches
+    # a query can contain the same term more than once.
+    return {query_id for query_id, query_words in found_query_words_dict.items()
+            if len(query_words) == len(set(reference_queries[query_id]["terms"]))}
 
 # %%
@@ -0,0 +1,15 @@
+# Verification of the candidates that are found in the deletion index.
+from rapidfuzz.distance import Levenshtein
+
+def bounded_levenshtein_distance(pattern, text, max_dist):
+    """
+    Levenshtein distance of rapidfuzz (bit-parallel, in C) that stops once max_dist is exceeded.
+    Returns the distance if it is at most max_dist, otherwise max_dist + 1.
+    """
+    if abs(len(pattern) - len(text)) > max_dist:
+        return max_dist + 1
+    return Levenshtein.distance(pattern, text, score_cutoff=max_dist)
+
+def is_within_edit_distance(query_word, doc_word, max_dist):
+    # not cached: a lookup of the word pair costs about as much as the verification itself
+    return Levenshtein.distance(query_word, doc_word, score_cutoff=max_dist) <= max_dist
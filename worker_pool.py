@@ -0,0 +1,153 @@
+# Long lived worker processes for the max throughput core.
+# Every worker keeps its own copy of the index. It is built up from the term deltas (added / removed terms)
+# that are broadcasted to the workers, so the index never has to be pickled and shipped in full.
+# Documents are then split up and dispatched to the already warm workers.
+# The core keeps no index of its own while the pool is running, the sizes and snapshots come from the first worker.
+from multiprocessing import Process, Pipe
+from trie_utils import find_words_matches
+from partitioned_index import LengthPartitionedIndex, DEFAULT_SIGNATURE_THRESHOLD
+from snapshot_utils import Snapshot, write_snapshot
+from core_stats import CoreStats
+
+def apply_index_update(trie, command, payload):
+    # applies a term delta or a snapshot to the index copy of a worker, also used by the dask workers (dask_utils.py)
+    match command:
+        case "add_term":
+            term_id, term, match_type, match_dist = payload
+            trie.insert_query(term_id, match_type, match_dist, [term])
+        case "remove_term":
+            term_id, term, match_type, match_dist = payload
+            trie.delete_query(term_id, match_type, match_dist, [term])
+        case "load_snapshot":
+            # every worker maps the snapshot file itself
+            snapshot = Snapshot(payload)
+            trie.load_snapshot(snapshot, snapshot.read_index_terms(snapshot.read_terms()))
+        case _:
+            raise Exception(f"Unknown index update '{command}'.")
+
+def save_index_snapshot(trie, payload):
+    # writes the snapshot of a worker index, returns the error instead of raising it, the core raises it again
+    snapshot_fp, queries, term_registry = payload
+    try:
+        write_snapshot(snapshot_fp, queries, term_registry, trie)
+    except Exception as error:
+        return error
+    return None
+
+def _worker_loop(conn, index_backend, collect_stats, signature_threshold):
+    trie = LengthPartitionedIndex(index_backend, CoreStats() if collect_stats else None, signature_threshold)
+
+    while True:
+        command, payload = conn.recv()
+
+        match command:
+            case "add_term" | "remove_term" | "load_snapshot":
+                apply_index_update(trie, command, payload)
+            case "match":
+                # only the words with hits are sent back
+                conn.send(find_words_matches(trie, payload))
+            case "get_stats":
+                conn.send(trie.runtime_stats.to_dict() if trie.runtime_stats is not None else None)
+            case "get_index_size":
+                conn.send(trie.size())
+            case "save_snapshot":
+                conn.send(save_index_snapshot(trie, payload))
+            case "reset_stats":
+                if trie.runtime_stats is not None:
+                    trie.runtime_stats.reset()
+            case "stop":
+                break
+            case _:
+                raise Exception(f"Unknown worker command '{command}'.")
+
+    conn.close()
+
+class WorkerPool:
+    def __init__(self, num_workers, index_backend="hash", collect_stats=False, signature_threshold=DEFAULT_SIGNATURE_THRESHOLD):
+        self.num_workers = num_workers
+        # the workers hold the index, the core does not need a copy of its own
+        self.has_index = True
+        self.connections = []
+        self.processes = []
+
+        for _ in range(num_workers):
+            parent_conn, child_conn = Pipe()
+            process = Process(target=_worker_loop, args=(child_conn, index_backend, collect_stats, signature_threshold), daemon=True)
+            process.start()
+            child_conn.close()
+
+            self.connections.append(parent_conn)
+            self.processes.append(process)
+
+    def _broadcast(self, command, payload):
+        # pipes keep the order of the messages, so every worker applies the deltas before the next document.
+        for conn in self.connections:
+            conn.send((command, payload))
+
+    def add_term(self, term_id, term, match_type, match_dist):
+        self._broadcast("add_term", (term_id, term, match_type, match_dist))
+
+    def remove_term(self, term_id, term, match_type, match_dist):
+        self._broadcast("remove_term", (term_id, term, match_type, match_dist))
+
+    def load_snapshot(self, snapshot_fp):
+        self._broadcast("load_snapshot", snapshot_fp)
+
+    def get_stats(self):
+        """
+        Returns the statistics (CoreStats.to_dict) of every worker.
+        """
+        self._broadcast("get_stats", None)
+        return [conn.recv() for conn in self.connections]
+
+    def reset_stats(self):
+        self._broadcast("reset_stats", None)
+
+    def get_index_size(self):
+        """
+        Returns the size (LengthPartitionedIndex.size) of the index, all workers hold the same one.
+        """
+        self.connections[0].send(("get_index_size", None))
+        return self.connections[0].recv()
+
+    def save_snapshot(self, snapshot_fp, queries, term_registry):
+        # the first worker writes its index together with the queries and the terms of the core
+        self.connections[0].send(("save_snapshot", (snapshot_fp, queries, term_registry)))
+        error = self.connections[0].recv()
+        if error is not None:
+            raise error
+
+    def find_words_matches(self, doc_words):
+        """
+        Splits the (distinct) document words over the workers and returns the hits of every word.
+        """
+        doc_words = list(doc_words)
+        partial_doc_words = [doc_words[i::self.num_workers] for i in range(self.num_workers)]
+
+        # send everything first, so that all workers are busy at the same time.
+        for conn, partial_doc_word in zip(self.connections, partial_doc_words):
+            conn.send(("match", partial_doc_word))
+
+        words_matches = {}
+        for conn in self.connections:
+            words_matches.update(conn.recv())
+
+        return words_matches
+
+    def close(self):
+        for conn in self.connections:
+            try:
+                conn.send(("stop", None))
+            except (BrokenPipeError, OSError):
+                pass
+
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+        for conn in self.connections:
+            conn.close()
+
+        self.connections.clear()
+        self.processes.clear()
@@ -0,0 +1,120 @@
+# Generates synthetic test files in the s/e/m/r format of the data folder.
+# usage: python3 workload_generator.py <test file> [number of queries] [number of documents] [seed]
+#
+# The words come from a seeded vocabulary model: the lorem ipsum words of lorem-text (extended with
+# compounds of them) or random letter sequences. Document words follow a zipf like distribution and
+# some of them get a typo, so that the hamming and edit queries have something to match.
+# The expected results are computed with the ReferenceCore while the file is written.
+import logging
+import random
+import sys
+
+from lorem_text import lorem
+
+from core_utils import MatchType
+from reference_core import ReferenceCore
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+def generate_vocabulary(rnd, vocabulary="lorem", vocabulary_size=5000, term_length=(4, 12)):
+    """
+    Returns a list of distinct words with a length in the term_length range (inclusive).
+    """
+    min_length, max_length = term_length
+    words = set()
+
+    if vocabulary == "lorem":
+        words.update(word for word in lorem.WORDS if min_length <= len(word) <= max_length)
+        base_words = sorted(lorem.WORDS)
+        # there are less than 200 lorem words, compounds make up the rest
+        for _ in range(vocabulary_size * 100):
+            if len(words) >= vocabulary_size:
+                break
+            word = (rnd.choice(base_words) + rnd.choice(base_words))[:rnd.randint(min_length, max_length)]
+            if len(word) >= min_length:
+                words.add(word)
+    elif vocabulary == "random":
+        while len(words) < vocabulary_size:
+            words.add("".join(rnd.choice(LETTERS) for _ in range(rnd.randint(min_length, max_length))))
+    else:
+        raise Exception(f"Unknown vocabulary '{vocabulary}', expected 'lorem' or 'random'.")
+
+    words = sorted(words)[:vocabulary_size]
+    rnd.shuffle(words)
+    return words
+
+def add_typo(rnd, word):
+    # substitutes, inserts or deletes one character
+    position = rnd.randrange(len(word))
+    match rnd.randrange(3):
+        case 0:
+            return word[:position] + rnd.choice(LETTERS) + word[position + 1:]
+        case 1:
+            return word[:position] + rnd.choice(LETTERS) + word[position:]
+        case _:
+            return word[:position] + word[position + 1:] if len(word) > 1 else word
+
+def generate_workload(test_fp, num_queries=1000, num_documents=100, words_per_query=(1, 5), document_length=(100, 500),
+                      term_length=(4, 12), type_weights=(1, 1, 1), dist_weights=(1, 1, 1), query_churn=0.1, typo_rate=0.05,
+                      vocabulary="lorem", vocabulary_size=5000, seed=42):
+    """
+    Writes a test file with num_queries active queries and num_documents documents.
+    type_weights are the weights of the match types (exact, hamming, edit), dist_weights the weights of the
+    match distances 1 to 3 of the hamming and edit queries. Before every document a query is replaced with
+    probability query_churn.
+    """
+    rnd = random.Random(seed)
+    words = generate_vocabulary(rnd, vocabulary, vocabulary_size, term_length)
+    # zipf like: the i-th word is drawn with weight 1 / (i + 1)
+    cumulative_weights = []
+    total_weight = 0.0
+    for rank in range(len(words)):
+        total_weight += 1 / (rank + 1)
+        cumulative_weights.append(total_weight)
+
+    reference_core = ReferenceCore()
+    reference_core.initialize_index()
+    active_queries = []
+    next_query_id = 1
+
+    with open(test_fp, "w") as test_file:
+        def start_query():
+            nonlocal next_query_id
+            match_type = rnd.choices(list(MatchType), weights=type_weights)[0]
+            match_dist = 0 if match_type == MatchType.EXACT else rnd.choices([1, 2, 3], weights=dist_weights)[0]
+            terms = rnd.sample(words, min(rnd.randint(*words_per_query), len(words)))
+
+            test_file.write(f"s {next_query_id} {match_type.value} {match_dist} {len(terms)} {' '.join(terms)}\n")
+            reference_core.start_query(next_query_id, " ".join(terms), match_type.value, match_dist)
+            active_queries.append(next_query_id)
+            next_query_id += 1
+
+        for _ in range(num_queries):
+            start_query()
+
+        for doc_id in range(1, num_documents + 1):
+            if active_queries and rnd.random() < query_churn:
+                query_id = active_queries.pop(rnd.randrange(len(active_queries)))
+                test_file.write(f"e {query_id}\n")
+                reference_core.end_query(query_id)
+                start_query()
+
+            doc_words = rnd.choices(words, cum_weights=cumulative_weights, k=rnd.randint(*document_length))
+            doc_words = [add_typo(rnd, word) if rnd.random() < typo_rate else word for word in doc_words]
+            test_file.write(f"m {doc_id} {len(doc_words)} {' '.join(doc_words)}\n")
+
+            reference_core.match_document(doc_id, " ".join(doc_words))
+            _, _, num_res, query_ids = reference_core.get_next_avail_res()
+            test_file.write(" ".join(["r", str(doc_id), str(num_res)] + [str(query_id) for query_id in sorted(query_ids)]) + "\n")
+
+    reference_core.destroy_index()
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.INFO)
+    test_fp = sys.argv[1]
+    num_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    num_documents = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    seed = int(sys.argv[4]) if len(sys.argv) > 4 else 42
+
+    generate_workload(test_fp, num_queries, num_documents, seed=seed)
+    logging.info(f"Generated {test_fp} with {num_queries} queries and {num_documents} documents.")